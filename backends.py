@@ -0,0 +1,330 @@
+"""This module provides pluggable execution backends for verification
+
+Every backend takes a data source (a DataFrame or a csv/parquet file path),
+standard constraints and optional custom constraints, and returns the same
+summaries as StandardVerifier and CustomVerifier. The duckdb backend
+translates all checks and custom rules to a single multithreaded scan that
+can spill to disk, so the data never has to fit in memory.
+"""
+
+from dataclasses import dataclass
+from typing import Union
+import pandas as pd
+from rules import (
+    required_file_columns,
+    rule_to_sql,
+    sql_identifier,
+    sql_literal,
+)
+from utils import read_file
+from verifiers import StandardVerifier, CustomVerifier, ParquetVerifier
+
+DUCKDB_DTYPES = {
+    "BOOLEAN": "bool",
+    "TINYINT": "int8",
+    "SMALLINT": "int16",
+    "INTEGER": "int32",
+    "BIGINT": "int64",
+    "UTINYINT": "uint8",
+    "USMALLINT": "uint16",
+    "UINTEGER": "uint32",
+    "UBIGINT": "uint64",
+    "FLOAT": "float32",
+    "DOUBLE": "float64",
+    "VARCHAR": "object",
+    "DATE": "datetime64[ns]",
+    "TIMESTAMP": "datetime64[ns]",
+    "TIMESTAMP_NS": "datetime64[ns]",
+}
+UNSUPPORTED_CHECKS = ("histogram", "frequencies")
+
+
+@dataclass
+class PandasBackend:
+    """
+    In-memory backend using StandardVerifier and CustomVerifier.
+    """
+
+    enforce_dtypes: bool = False
+
+    def verify(
+        self,
+        source: Union[str, pd.DataFrame],
+        constraints: dict,
+        custom_constraints: list = None,
+    ) -> tuple:
+        """
+        Verify a data source. Files are read with the constrained columns
+        and the columns the custom rules use only.
+        :param source: a DataFrame or a csv, xlsx or parquet file path,
+        parquet files are pruned with row group statistics
+        :param constraints: a standard constraints dict
+        :param custom_constraints: a list of custom constraints
+        :return: a tuple with the standard and custom validation summaries,
+        the custom summary is None without custom constraints
+        """
+        if (
+            isinstance(source, str)
+            and source.endswith(".parquet")
+            and not self.enforce_dtypes
+        ):
+            summary = ParquetVerifier(source, constraints).validation_summary
+            if custom_constraints:
+                source = read_file(
+                    source,
+                    columns=required_file_columns(custom_constraints, source),
+                )
+        else:
+            if not isinstance(source, pd.DataFrame):
+                source = read_file(
+                    source,
+                    columns=required_file_columns(
+                        custom_constraints or [], source, constraints
+                    ),
+                )
+            summary = StandardVerifier(
+                source, constraints, self.enforce_dtypes, keep_rows=False
+            ).validation_summary
+        custom_summary = None
+        if custom_constraints:
+            custom_summary = CustomVerifier(
+                source, custom_constraints
+            ).validation_summary
+        return summary, custom_summary
+
+
+@dataclass
+class DuckDBBackend:
+    """
+    Out-of-core backend running all checks in one duckdb scan. Requires
+    the duckdb package.
+    """
+
+    threads: int = None
+    memory_limit: str = None
+    temp_directory: str = None
+
+    def _connect(self):
+        """Open a duckdb connection with the backend settings"""
+        # pylint: disable=import-outside-toplevel
+        import duckdb
+
+        con = duckdb.connect()
+        if self.threads:
+            con.execute(f"SET threads = {int(self.threads)}")
+        if self.memory_limit:
+            limit = sql_literal(self.memory_limit)
+            con.execute(f"SET memory_limit = {limit}")
+        if self.temp_directory:
+            con.execute(
+                f"SET temp_directory = {sql_literal(self.temp_directory)}"
+            )
+        return con
+
+    @staticmethod
+    def _relation(con, source: Union[str, pd.DataFrame]) -> str:
+        """Get the SQL relation for a DataFrame or file source"""
+        if isinstance(source, pd.DataFrame):
+            con.register("source_frame", source)
+            return "source_frame"
+        if source.endswith(".parquet"):
+            return f"read_parquet({sql_literal(source)})"
+        if source.endswith(".csv"):
+            return f"read_csv_auto({sql_literal(source)})"
+        raise ValueError("Source can be a DataFrame, 'csv' or 'parquet'")
+
+    @staticmethod
+    def _column_types(con, relation: str) -> dict:
+        """Get the duckdb type of each column of a relation"""
+        return {
+            row[0]: row[1]
+            for row in con.execute(
+                f"DESCRIBE SELECT * FROM {relation}"
+            ).fetchall()
+        }
+
+    @staticmethod
+    def check_data_type(constraint: str, col_type: str) -> bool:
+        """Check a duckdb column type against a pandas dtype constraint"""
+        if col_type.startswith("ENUM"):
+            return constraint != "category"
+        return DUCKDB_DTYPES.get(col_type, col_type.lower()) != constraint
+
+    @staticmethod
+    def check_sql(check: str, constraint, col: str, col_type: str) -> str:
+        """
+        Translate a standard check to a SQL aggregate counting breaks
+        :param check: an str with the check name
+        :param constraint: the constraint value
+        :param col: an str with the column name
+        :param col_type: an str with the duckdb column type
+        :return: an str with the SQL aggregate, or None where the pandas
+        check does not apply to the column type
+        """
+        # pylint: disable=too-many-return-statements
+        name = sql_identifier(col)
+        is_null = f"{name} IS NULL"
+        if col_type in ("FLOAT", "DOUBLE"):
+            is_null = f"({name} IS NULL OR isnan({name}))"
+        if check == "nullable":
+            return "0" if constraint else _count_where(is_null)
+        if check == "unique":
+            if not constraint:
+                return "0"
+            return f"count({name}) - count(DISTINCT {name})"
+        if check in ("max_length", "min_length"):
+            return _length_sql(check, constraint, name, col_type, is_null)
+        if check == "value_range":
+            values = [sql_literal(val) for val in constraint if pd.notna(val)]
+            if not values:
+                return _count_where(f"NOT {is_null}")
+            return _count_where(
+                f"NOT {is_null} AND {name} NOT IN ({', '.join(values)})"
+            )
+        if check in ("max_value", "min_value", "max_date", "min_date"):
+            return _bound_sql(check, constraint, name, col_type)
+        if check == "reference":
+            reference = DuckDBBackend._relation(None, constraint["file"])
+            key = sql_identifier(constraint["column"])
+            return _count_where(
+                f"NOT {is_null} AND {name} NOT IN "
+                f"(SELECT {key} FROM {reference} WHERE {key} IS NOT NULL)"
+            )
+        if check in UNSUPPORTED_CHECKS:
+            raise ValueError(f"Check '{check}' is not supported by duckdb")
+        raise KeyError(check)
+
+    def _aggregates(
+        self, constraints: dict, custom_constraints: list, types: dict
+    ) -> tuple:
+        """
+        Collect the SQL aggregates of all checks and rules
+        :param constraints: a standard constraints dict
+        :param custom_constraints: a list of custom constraints
+        :param types: a dict with the duckdb type of each column
+        :return: a tuple with the verification dict, data_type results
+        filled in, and a dict with the SQL aggregate per check or rule
+        """
+        verification = {}
+        aggregates = {}
+        for col, checks in constraints.items():
+            if col not in types:
+                raise KeyError(col)
+            verification[col] = {}
+            for check, constraint in checks.items():
+                if check == "data_type":
+                    verification[col][check] = self.check_data_type(
+                        constraint, types[col]
+                    )
+                    continue
+                sql = self.check_sql(check, constraint, col, types[col])
+                verification[col][check] = None
+                if sql is not None:
+                    aggregates[col, check] = sql
+        for constraint in custom_constraints:
+            condition = rule_to_sql(constraint["query"], tuple(types))
+            aggregates[constraint["name"]] = _count_where(condition)
+        return verification, aggregates
+
+    def verify(
+        self,
+        source: Union[str, pd.DataFrame],
+        constraints: dict,
+        custom_constraints: list = None,
+    ) -> tuple:
+        """
+        Verify a data source with a single scan
+        :param source: a DataFrame or a csv or parquet file path
+        :param constraints: a standard constraints dict
+        :param custom_constraints: a list of custom constraints
+        :return: a tuple with the standard and custom validation summaries,
+        the custom summary is None without custom constraints
+        """
+        con = self._connect()
+        relation = self._relation(con, source)
+        types = self._column_types(con, relation)
+        custom_constraints = custom_constraints or []
+        verification, aggregates = self._aggregates(
+            constraints, custom_constraints, types
+        )
+        counts = []
+        if aggregates:
+            counts = con.execute(
+                f"SELECT {', '.join(aggregates.values())} FROM {relation}"
+            ).fetchone()
+        con.close()
+        results = dict(zip(aggregates, counts))
+        for col, checks in verification.items():
+            for check in checks:
+                checks[check] = results.get((col, check), checks[check])
+
+        custom_summary = None
+        if custom_constraints:
+            custom_summary = _custom_summary(custom_constraints, results)
+        return pd.DataFrame(verification), custom_summary
+
+
+def _custom_summary(custom_constraints: list, results: dict):
+    """Build the custom validation summary from the rule break counts"""
+    return pd.DataFrame(
+        [
+            {
+                "name": constraint["name"],
+                "rule": constraint["query"],
+                "count": results[constraint["name"]],
+            }
+            for constraint in custom_constraints
+        ]
+    )
+
+
+def _count_where(condition: str) -> str:
+    """Count the rows matching a SQL condition"""
+    return f"count(*) FILTER (WHERE {condition})"
+
+
+def _length_sql(
+    check: str, constraint, name: str, col_type: str, is_null: str
+) -> str:
+    """Translate a min/max length check, None for numeric columns"""
+    if DUCKDB_DTYPES.get(col_type, "").startswith(
+        ("bool", "int", "uint", "float")
+    ):
+        return None
+    operator = ">" if check == "max_length" else "<"
+    return _count_where(
+        f"NOT {is_null} AND "
+        f"length(CAST({name} AS VARCHAR)) {operator} {int(constraint)}"
+    )
+
+
+def _bound_sql(check: str, constraint, name: str, col_type: str) -> str:
+    """
+    Translate a min/max value or date check, None for date checks on
+    columns that are not dates
+    """
+    is_date = check.endswith("_date")
+    if is_date and not col_type.startswith(("DATE", "TIMESTAMP")):
+        return None
+    if pd.isna(constraint):
+        return "0"
+    operator = ">" if check.startswith("max") else "<"
+    bound = sql_literal(constraint)
+    if is_date:
+        bound = f"CAST({sql_literal(str(constraint))} AS {col_type})"
+    return _count_where(f"{name} {operator} {bound}")
+
+
+BACKENDS = {"pandas": PandasBackend, "duckdb": DuckDBBackend}
+
+
+def get_backend(name: str = "pandas", **options):
+    """
+    Get a verification backend by name
+    :param name: an str with the backend name, 'pandas' or 'duckdb'
+    :param options: backend options, e.g. threads or memory_limit
+    :return: a backend with a verify method
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Backend can be {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
@@ -0,0 +1,112 @@
+"""This module provides batch validation of many files in a process pool"""
+
+import os
+from glob import glob
+from typing import List, Union
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from constraints import StandardConstraints
+from verifiers import StandardVerifier, ChunkedVerifier, ParquetVerifier
+from utils import constraint_dtypes, read_file, iter_excel
+
+
+def list_files(files: Union[str, List[str]]) -> List[str]:
+    """
+    Resolve a glob pattern, a manifest file or a list of paths, largest
+    file first so the slowest files start early and cut tail latency.
+    :param files: a glob str, a .txt manifest with one path per line,
+    or a list of file paths
+    :return: a list of file paths sorted by size, descending
+    """
+    if isinstance(files, str) and files.endswith(".txt"):
+        with open(files, "r", encoding="utf-8") as manifest:
+            paths = [line.strip() for line in manifest if line.strip()]
+    elif isinstance(files, str):
+        paths = glob(files)
+    else:
+        paths = list(files)
+    return sorted(paths, key=os.path.getsize, reverse=True)
+
+
+def verify_file(
+    file_path: str, constraints_file: str, enforce_dtypes: bool = False
+) -> pd.DataFrame:
+    """
+    Read and verify a single file. Runs in the worker process, so only
+    the paths are sent to it and only the summary is sent back.
+    :param file_path: an str path to csv, xlsx or parquet file, xlsx files
+    are streamed in batches typed with the constraint dtypes and parquet
+    files are pruned with row group statistics
+    :param constraints_file: an str path to a csv or json constraints file
+    :param enforce_dtypes: a bool to enforce constraint dtypes
+    :return: a DataFrame with the validation summary
+    """
+    constraints = StandardConstraints().read_constraints(constraints_file)
+    return verify_path(file_path, constraints, enforce_dtypes)
+
+
+def verify_path(
+    file_path: str, constraints: dict, enforce_dtypes: bool = False
+) -> pd.DataFrame:
+    """
+    Verify a single file with the reader that fits its format
+    :param file_path: an str path to csv, xlsx or parquet file, csv date
+    columns are read with the constraint dtypes
+    :param constraints: a standard constraints dict
+    :param enforce_dtypes: a bool to enforce constraint dtypes
+    :return: a DataFrame with the validation summary
+    """
+    if file_path.endswith(".xlsx"):
+        return ChunkedVerifier(
+            iter_excel(file_path, constraint_dtypes(constraints)),
+            constraints,
+            enforce_dtypes,
+        ).validation_summary
+    if file_path.endswith(".parquet") and not enforce_dtypes:
+        return ParquetVerifier(file_path, constraints).validation_summary
+    frame = read_file(
+        file_path, constraint_dtypes(constraints, not enforce_dtypes)
+    )
+    verifier = StandardVerifier(frame, constraints, enforce_dtypes)
+    return verifier.validation_summary
+
+
+def validate_files(
+    files: Union[str, List[str]],
+    constraints_file: str,
+    max_workers: int = None,
+    enforce_dtypes: bool = False,
+) -> pd.DataFrame:
+    """
+    Validate many files against the same constraints in a process pool
+    :param files: a glob str, a .txt manifest or a list of file paths
+    :param constraints_file: an str path to a csv or json constraints file
+    :param max_workers: an int with the max number of worker processes
+    :param enforce_dtypes: a bool to enforce constraint dtypes
+    :return: a DataFrame with the summaries of all files, indexed by
+    file and check. A file that fails to read or verify gets an error row
+    with the message in the error column.
+    """
+    paths = list_files(files)
+    if not paths:
+        raise ValueError(f"No files found for {files}")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(
+                verify_file, path, constraints_file, enforce_dtypes
+            )
+            for path in paths
+        ]
+        summaries = []
+        for future in futures:
+            error = future.exception()
+            if error is None:
+                summaries.append(future.result())
+            else:
+                summaries.append(
+                    pd.DataFrame(
+                        {"error": [f"{type(error).__name__}: {error}"]},
+                        index=["error"],
+                    )
+                )
+    return pd.concat(summaries, keys=paths, names=["file", "check"])
@@ -0,0 +1,86 @@
+"""This module provides a packed per-row violation bitmap
+
+Each (column, check) pair gets one bit, rows are stored as uint64 words,
+so a validation result takes a few bytes per row instead of full copies of
+the failing rows.
+"""
+
+from dataclasses import dataclass, field
+import numpy as np
+
+WORD_BITS = 64
+POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], np.uint8)
+
+
+@dataclass
+class ViolationBitmap:
+    """
+    ViolationBitmap class stores one bit per row and (column, check).
+    """
+
+    nr_rows: int
+    checks: list = field(default_factory=list)
+    words: np.ndarray = field(default=None, repr=False)
+
+    def __post_init__(self):
+        "Post init calculations."
+        if self.words is None:
+            self.words = np.zeros((self.nr_rows, 1), dtype=np.uint64)
+
+    def add(self, col: str, check: str, breaks: np.ndarray, label: str = ""):
+        """
+        Set the bit of a (column, check) pair for the failing rows
+        :param col: an str with the column name
+        :param check: an str with the check name
+        :param breaks: a boolean array with one value per row
+        :param label: an str with the Validation label of the check
+        """
+        bit = len(self.checks)
+        self.checks.append((col, check, label))
+        word, offset = divmod(bit, WORD_BITS)
+        if word >= self.words.shape[1]:
+            grown = np.zeros((self.nr_rows, 1), dtype=np.uint64)
+            self.words = np.hstack([self.words, grown])
+        breaks = np.asarray(breaks, dtype=bool)
+        if breaks.any():
+            bits = breaks.astype(np.uint64) << np.uint64(offset)
+            self.words[:, word] |= bits
+
+    def _selection(self, col: str = None, check: str = None) -> np.ndarray:
+        """Build a word mask for the checks matching col and check"""
+        mask = np.zeros(self.words.shape[1], dtype=np.uint64)
+        for bit, (bit_col, bit_check, _) in enumerate(self.checks):
+            if col in (None, bit_col) and check in (None, bit_check):
+                word, offset = divmod(bit, WORD_BITS)
+                mask[word] |= np.uint64(1) << np.uint64(offset)
+        return mask
+
+    def failing(self, col: str = None, check: str = None) -> np.ndarray:
+        """
+        Get rows failing any check, optionally limited to a column and/or a
+        check type
+        :param col: an str with the column name or None for all columns
+        :param check: an str with the check name or None for all checks
+        :return: a boolean array with one value per row
+        """
+        return (self.words & self._selection(col, check)).any(axis=1)
+
+    def count(self, col: str = None, check: str = None) -> np.ndarray:
+        """
+        Get the number of failed checks per row
+        :param col: an str with the column name or None for all columns
+        :param check: an str with the check name or None for all checks
+        :return: an int array with one value per row
+        """
+        selected = self.words & self._selection(col, check)
+        bytes_view = selected.view(np.uint8).reshape(self.nr_rows, -1)
+        return POPCOUNT[bytes_view].sum(axis=1, dtype=np.int64)
+
+    def mask(self, bit: int) -> np.ndarray:
+        """
+        Get the failing rows of a single check
+        :param bit: an int with the position of the check in checks
+        :return: a boolean array with one value per row
+        """
+        word, offset = divmod(bit, WORD_BITS)
+        return (self.words[:, word] >> np.uint64(offset)) & np.uint64(1) == 1
@@ -0,0 +1,199 @@
+"""Headless command line interface for frame validation
+
+pandas, numpy and the validation modules are imported inside the command
+handlers, so parsing arguments and --help stay fast for short-lived jobs.
+"""
+
+import argparse
+import sys
+
+
+def profile(args: argparse.Namespace) -> int:
+    """
+    Generate constraints for a data file and save them
+    :param args: parsed command line arguments
+    :return: an int exit code
+    """
+    # pylint: disable=import-outside-toplevel
+    from constraints import StandardConstraints
+    from utils import read_file
+
+    frame = read_file(args.data)
+    constraints = StandardConstraints()
+    constraints.generate_constraints(frame, sketch=args.sketch)
+    if args.output:
+        constraints.save_as(args.output)
+    else:
+        print(constraints)
+    return 0
+
+
+def validate(args: argparse.Namespace) -> int:
+    """
+    Validate a data file against standard constraints
+    :param args: parsed command line arguments
+    :return: an int exit code, 1 if any break was found
+    """
+    # pylint: disable=import-outside-toplevel
+    from constraints import StandardConstraints
+    from verifiers import StandardVerifier
+    from utils import constraint_dtypes, read_file
+
+    constraints = StandardConstraints().read_constraints(args.constraints)
+    frame = read_file(
+        args.data, constraint_dtypes(constraints, not args.enforce_dtypes)
+    )
+    verifier = StandardVerifier(frame, constraints, args.enforce_dtypes)
+    return _report(verifier, args)
+
+
+def validate_custom(args: argparse.Namespace) -> int:
+    """
+    Validate a data file against custom constraints. Only the columns the
+    rules use are read, unless the breaks are saved with all columns.
+    :param args: parsed command line arguments
+    :return: an int exit code, 1 if any break was found
+    """
+    # pylint: disable=import-outside-toplevel
+    from constraints import CustomConstraints
+    from verifiers import CustomVerifier
+    from rules import required_file_columns
+    from utils import read_file
+
+    constraints = CustomConstraints().read_constraints(args.constraints)
+    columns = None
+    if not args.breaks:
+        columns = required_file_columns(constraints, args.data)
+    frame = read_file(args.data, columns=columns)
+    verifier = CustomVerifier(frame, constraints)
+    return _report(verifier, args)
+
+
+def watch(args: argparse.Namespace) -> int:
+    """
+    Validate files landing in directories until interrupted
+    :param args: parsed command line arguments
+    :return: an int exit code
+    """
+    # pylint: disable=import-outside-toplevel
+    from daemon import WatchDaemon
+
+    WatchDaemon(
+        args.directories,
+        args.constraints,
+        args.output_dir,
+        max_workers=args.workers,
+        queue_size=args.queue_size,
+        poll_interval=args.poll_interval,
+        polling=args.polling,
+        metrics_port=args.metrics_port,
+        enforce_dtypes=args.enforce_dtypes,
+    ).run()
+    return 0
+
+
+def _report(verifier, args: argparse.Namespace) -> int:
+    """Save or print the verifier summary and breaks"""
+    if args.output:
+        verifier.validation_summary.to_csv(args.output)
+    else:
+        print(verifier.validation_summary)
+    if args.breaks:
+        verifier.validation_data.to_csv(args.breaks)
+    return int(_break_count(verifier.validation_summary) > 0)
+
+
+def _break_count(summary) -> float:
+    """
+    Count the breaks of a standard or custom summary, data_type breaks
+    count as one and checks that do not apply are skipped
+    """
+    if "count" in summary.columns and "rule" in summary.columns:
+        return summary["count"].astype(float).sum()
+    return summary.stack().astype(float).sum()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the command line parser"""
+    parser = argparse.ArgumentParser(
+        prog="dv-py", description="Validate DataFrames against constraints"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    profile_parser = subparsers.add_parser(
+        "profile", help="generate constraints for a csv or xlsx file"
+    )
+    profile_parser.add_argument("data", help="csv or xlsx file to profile")
+    profile_parser.add_argument(
+        "-o", "--output", help="csv or json file to save constraints to"
+    )
+    profile_parser.add_argument(
+        "--sketch",
+        action="store_true",
+        help="use sketches to bound memory on very large columns",
+    )
+    profile_parser.set_defaults(func=profile)
+
+    for name, func, help_text in (
+        ("validate", validate, "validate against standard constraints"),
+        ("validate-custom", validate_custom, "validate against custom rules"),
+    ):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("data", help="csv or xlsx file to validate")
+        sub.add_argument("constraints", help="csv or json constraints file")
+        sub.add_argument("-o", "--output", help="csv file to save summary to")
+        sub.add_argument("--breaks", help="csv file to save break rows to")
+        sub.set_defaults(func=func)
+        if name == "validate":
+            sub.add_argument(
+                "--enforce-dtypes",
+                action="store_true",
+                help="cast the data to the constraints data types",
+            )
+
+    watch_parser = subparsers.add_parser(
+        "watch", help="validate files landing in directories"
+    )
+    watch_parser.add_argument("constraints", help="csv or json constraints")
+    watch_parser.add_argument(
+        "directories", nargs="+", help="directories to watch"
+    )
+    watch_parser.add_argument(
+        "-o", "--output-dir", required=True, help="directory for summaries"
+    )
+    watch_parser.add_argument(
+        "--workers", type=int, help="number of worker processes"
+    )
+    watch_parser.add_argument(
+        "--queue-size", type=int, default=1000, help="max queued files"
+    )
+    watch_parser.add_argument(
+        "--poll-interval", type=float, default=1.0, help="seconds per poll"
+    )
+    watch_parser.add_argument(
+        "--polling",
+        action="store_true",
+        help="poll the directories instead of using inotify",
+    )
+    watch_parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="serve json metrics on localhost:PORT/metrics",
+    )
+    watch_parser.add_argument(
+        "--enforce-dtypes",
+        action="store_true",
+        help="cast the data to the constraints data types",
+    )
+    watch_parser.set_defaults(func=watch)
+    return parser
+
+
+def main(argv: list = None) -> int:
+    """Command line entry point"""
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,16 +5,63 @@ from dataclasses import dataclass, field
 from ast import literal_eval
 import pandas as pd
 import numpy as np
-from utils import TypeEncoder
+from utils import TypeEncoder, dtype_name
+from sketches import HyperLogLog, reservoir_sample
+import drift as drift_stats
+from rules import compile_rule
+
+MAX_CATEGORIES = 20
+MAX_DETERMINANT_RATIO = 0.5
+
+
+def _same_value(left, right) -> bool:
+    """Compare constraint values, missing values are equal"""
+    if isinstance(left, (set, dict, list)) or isinstance(
+        right, (set, dict, list)
+    ):
+        return left == right
+    if pd.isna(left) and pd.isna(right):
+        return True
+    return left == right
+
+
+def diff_constraints(old: dict, new: dict) -> dict:
+    """
+    Structural diff of two constraints dicts
+    :param old: a constraints dict
+    :param new: a constraints dict
+    :return: a dict with added and removed columns and a changed dict with
+    (old, new) tuples per check, None for a missing check
+    """
+    changed = {}
+    for col in old.keys() & new.keys():
+        checks = {
+            check: (old[col].get(check), new[col].get(check))
+            for check in {**old[col], **new[col]}
+            if check not in old[col]
+            or check not in new[col]
+            or not _same_value(old[col][check], new[col][check])
+        }
+        if checks:
+            changed[col] = checks
+    return {
+        "added": [col for col in new if col not in old],
+        "removed": [col for col in old if col not in new],
+        "changed": {col: changed[col] for col in old if col in changed},
+    }
 
 
 @dataclass
-class StandardConstraints:
+class StandardConstraints:  # pylint: disable=too-many-public-methods
     """
     Standard Constraints class provides a data constraints discovery.
+    User overrides are kept apart from the discovered values, so they
+    survive a new discovery run.
     """
 
     constraints: dict = field(default_factory=dict)
+    discovered: dict = field(default_factory=dict)
+    overrides: dict = field(default_factory=dict)
 
     def __str__(self):
         var = []
@@ -24,7 +71,7 @@ class StandardConstraints:
 
     def get_data_type(self, data: pd.DataFrame, colname: str) -> str:
         """Get column data types"""
-        return data[colname].dtype.name
+        return dtype_name(data[colname].dtype)
 
     def is_nullable(self, data: pd.DataFrame, colname: str) -> bool:
         """Get nullable constraint True/False"""
@@ -34,18 +81,61 @@ class StandardConstraints:
         """Get unique constraint True/False"""
         return ~data[colname].duplicated().any()
 
+    def approx_is_unique(self, data: pd.DataFrame, colname: str) -> bool:
+        """
+        Get unique constraint True/False, running the exact check only
+        when the distinct count sketch cannot rule out uniqueness
+        """
+        sketch = HyperLogLog().update(data[colname])
+        min_distinct = len(data[colname]) * (1 - 3 * sketch.relative_error)
+        if sketch.estimate() < min_distinct:
+            return False
+        return self.is_unique(data, colname)
+
+    def is_category(
+        self, data: pd.DataFrame, colname: str, sketch: bool = False
+    ) -> bool:
+        """
+        Get category (True) or string (False) for an object column. With
+        sketch, the exact distinct count is only taken when the estimate
+        is too close to MAX_CATEGORIES to decide.
+        """
+        if sketch:
+            hll = HyperLogLog().update(data[colname])
+            estimate = hll.estimate()
+            margin = 3 * hll.relative_error * estimate
+            if abs(estimate - MAX_CATEGORIES) > margin:
+                return estimate <= MAX_CATEGORIES
+        return len(data[colname].unique()) <= MAX_CATEGORIES
+
     def max_length(self, data: pd.DataFrame, colname: str) -> int:
         """Get max length constraint"""
+        if isinstance(data[colname].dtype, pd.StringDtype):
+            return data[colname].str.len().max()
         return max(data[colname].map(str).map(len))
 
     def min_length(self, data: pd.DataFrame, colname: str) -> int:
         """Get min length constraint"""
+        if isinstance(data[colname].dtype, pd.StringDtype):
+            return data[colname].str.len().min()
         return min(data[colname].dropna().map(str).map(len))
 
     def value_range(self, data: pd.DataFrame, colname: str) -> set:
         """Get range of values constraint"""
         return set(data[colname])
 
+    def approx_value_range(
+        self, data: pd.DataFrame, colname: str, sample_size: int = 1000
+    ) -> set:
+        """
+        Get range of values constraint from a reservoir sample, falling
+        back to the exact set when the sample misses a value
+        """
+        candidates = set(reservoir_sample(data[colname], sample_size))
+        if data[colname].isin(candidates).all():
+            return candidates
+        return set(data[colname].unique())
+
     def min_value(self, data: pd.DataFrame, colname: str) -> float:
         """Get min value constraint"""
         return data[colname].min()
@@ -54,6 +144,20 @@ class StandardConstraints:
         """Get min value constraint"""
         return data[colname].max()
 
+    def histogram(
+        self, data: pd.DataFrame, colname: str, edges: list = None
+    ) -> dict:
+        """Get binned histogram drift constraint, on the given edges if set"""
+        if edges is None:
+            edges = drift_stats.histogram_edges(
+                self.min_value(data, colname), self.max_value(data, colname)
+            )
+        return drift_stats.histogram(data[colname], edges)
+
+    def frequencies(self, data: pd.DataFrame, colname: str) -> dict:
+        """Get category frequencies drift constraint"""
+        return drift_stats.frequencies(data[colname])
+
     def min_date(self, data: pd.DataFrame, colname: str) -> str:
         """Get min value constraint"""
         if data[colname].notnull().any():
@@ -70,24 +174,35 @@ class StandardConstraints:
             val = data[colname].max()
         return val
 
-    def generate_constraints(self, data: pd.DataFrame) -> dict:
+    def generate_constraints(
+        self,
+        data: pd.DataFrame,
+        sketch: bool = False,
+        drift: bool = False,
+        edges: dict = None,
+    ) -> dict:
         """
         Discover standard constraints dict based on provided DataFrame
         :param data: a pandas DataFrame
+        :param sketch: a bool to use distinct count sketches and sampling,
+        keeping discovery memory bounded on very large columns
+        :param drift: a bool to add histogram and frequencies constraints
+        for distribution drift checks
+        :param edges: a dict with histogram edges per column, e.g. from
+        drift.constraint_edges of an earlier chunk, so the histograms of
+        both chunks can be merged
         :return: A dict with constraints
         """
+        edges = edges or {}
         all_cols = data.columns
 
         # separate string columns from category columns
         for col in all_cols:
-            if issubclass(data[col].dtypes.type, np.object_) and (
-                len(data[col].unique()) <= 20
-            ):
-                data[col] = data[col].astype("category")
-            elif issubclass(data[col].dtypes.type, np.object_) and (
-                len(data[col].unique()) > 20
-            ):
-                data[col] = data[col].astype(str)
+            if issubclass(data[col].dtypes.type, np.object_):
+                if self.is_category(data, col, sketch):
+                    data[col] = data[col].astype("category")
+                else:
+                    data[col] = data[col].astype(str)
 
         nr_cols = data.select_dtypes(include=["number"]).columns
         str_cols = data.select_dtypes(include=["string", "object"]).columns
@@ -104,13 +219,21 @@ class StandardConstraints:
                 {
                     "min_length": self.min_length(data, col),
                     "max_length": self.max_length(data, col),
-                    "value_range": self.value_range(data, col),
+                    "value_range": self.approx_value_range(data, col)
+                    if sketch
+                    else self.value_range(data, col),
                 }
             )
+            if drift:
+                self.constraints[col]["frequencies"] = self.frequencies(
+                    data, col
+                )
         for col in str_cols:
             self.constraints[col].update(
                 {
-                    "unique": self.is_unique(data, col),
+                    "unique": self.approx_is_unique(data, col)
+                    if sketch
+                    else self.is_unique(data, col),
                     "min_length": self.min_length(data, col),
                     "max_length": self.max_length(data, col),
                 }
@@ -122,6 +245,10 @@ class StandardConstraints:
                     "max_value": self.max_value(data, col),
                 }
             )
+            if drift:
+                self.constraints[col]["histogram"] = self.histogram(
+                    data, col, edges.get(col)
+                )
         for col in dt_cols:
             self.constraints[col].update(
                 {
@@ -129,6 +256,63 @@ class StandardConstraints:
                     "max_date": self.max_date(data, col),
                 }
             )
+        for col in all_cols:
+            self.discovered[col] = dict(self.constraints[col])
+            self.constraints[col].update(self.overrides.get(col, {}))
+        return self.constraints
+
+    def changed_columns(self, data: pd.DataFrame) -> list:
+        """
+        Get the columns of a DataFrame that are new or whose dtype no
+        longer matches the discovered data_type
+        :param data: a pandas DataFrame
+        :return: a list of column names
+        """
+        changed = []
+        for col in data.columns:
+            checks = self.discovered.get(col, self.constraints.get(col))
+            if checks is None or "data_type" not in checks:
+                changed.append(col)
+            elif issubclass(data[col].dtypes.type, np.object_):
+                if checks["data_type"] not in ("object", "category"):
+                    changed.append(col)
+            elif dtype_name(data[col].dtype) != checks["data_type"]:
+                changed.append(col)
+        return changed
+
+    def update_constraints(
+        self,
+        data: pd.DataFrame,
+        columns: list = None,
+        sketch: bool = False,
+        drift: bool = False,
+    ) -> dict:
+        """
+        Incrementally regenerate constraints, profiling only new or changed
+        columns. Columns missing from the DataFrame are dropped, overrides
+        are applied again.
+        :param data: a pandas DataFrame
+        :param columns: a list of columns to profile again, the
+        changed_columns if None
+        :param sketch: a bool to use distinct count sketches and sampling
+        :param drift: a bool to add drift constraints
+        :return: A dict with constraints
+        """
+        if columns is None:
+            columns = self.changed_columns(data)
+        profile = StandardConstraints()
+        if columns:
+            profile.generate_constraints(data[columns].copy(), sketch, drift)
+        constraints = {}
+        for col in data.columns:
+            if col in profile.discovered:
+                self.discovered[col] = profile.discovered[col]
+            checks = self.discovered.get(col, self.constraints.get(col, {}))
+            constraints[col] = {**checks, **self.overrides.get(col, {})}
+        self.discovered = {
+            col: val for col, val in self.discovered.items() if col in data
+        }
+        self.constraints = constraints
         return self.constraints
 
     def modify_constraint(self, column: str, modify_dict: dict) -> dict:
@@ -141,6 +325,7 @@ class StandardConstraints:
         Returns:
             A modify dict with updated constraints
         """
+        self.overrides.setdefault(column, {}).update(modify_dict)
         self.constraints[column].update(modify_dict)
         return self.constraints
 
@@ -159,6 +344,29 @@ class StandardConstraints:
         else:
             raise ValueError("Save values can be 'json' or 'csv'")
 
+    def save_overrides(self, save_as: str):
+        """
+        Save the user overrides to a json file
+        :param save_as: an str with json file name
+        """
+        with open(save_as, "w", encoding="utf-8") as s_file:
+            json.dump(self.overrides, s_file, indent=4, cls=TypeEncoder)
+
+    def read_overrides(self, file_name: str) -> dict:
+        """
+        Read user overrides from a json file and apply them
+        :param file_name: an str with json file name
+        :return: A dict with constraints
+        """
+        with open(file_name, "r", encoding="utf-8") as read_file:
+            overrides = json.loads(read_file.read())
+        for column, modify_dict in overrides.items():
+            if column in self.constraints:
+                self.modify_constraint(column, modify_dict)
+            else:
+                self.overrides.setdefault(column, {}).update(modify_dict)
+        return self.constraints
+
     def read_constraints(self, file_name: str):
         """
         Read constraints from file
@@ -189,6 +397,8 @@ class StandardConstraints:
                         val["value_range"] = literal_eval(
                             literal_eval(json.dumps(range_values))
                         )
+                    elif key in ("histogram", "frequencies", "reference"):
+                        val[key] = literal_eval(val[key])
             self.constraints = frame
         return self.constraints
 
@@ -228,6 +438,19 @@ class CustomConstraints:
                 self.custom_constraints.remove(constraint)
         return self.custom_constraints
 
+    def compile_rules(self, columns: list) -> list:
+        """
+        Compile all custom constraints against a known column set, e.g.
+        the columns of the standard constraints
+        :param columns: a list of known column names
+        :return: a list of CompiledRule with the columns each rule uses
+        :raises KeyError: if a rule uses a column that is not known
+        """
+        return [
+            compile_rule(constraint["query"], tuple(columns))
+            for constraint in self.custom_constraints
+        ]
+
     def view_custom_constraints(self):
         """
         Convert list of custom constraints to DataFrame
@@ -267,3 +490,136 @@ class CustomConstraints:
             frame = frame.to_dict("records")
             self.custom_constraints = frame
         return self.custom_constraints
+
+
+def _pair_count(left: tuple, right: tuple) -> int:
+    """
+    Count the distinct value pairs of two factorized columns
+    :param left: a tuple with the codes and code count of a column
+    :param right: a tuple with the codes and code count of a column
+    :return: an int with the number of distinct pairs
+    """
+    return len(pd.unique(left[0] * right[1] + right[0]))
+
+
+@dataclass
+class MultiColumnConstraints:
+    """
+    MultiColumnConstraints class provides discovery of composite key
+    uniqueness and functional dependencies between columns.
+    """
+
+    multi_constraints: list = field(default_factory=list)
+
+    def add_composite_unique(self, columns: list) -> list:
+        """
+        Add a composite key uniqueness constraint
+        :param columns: a list of column names forming the key
+        :return: an updated multi column constraints list
+        """
+        return self._add("composite_unique", columns)
+
+    def add_functional_dependency(self, determinant: str, dependent: str):
+        """
+        Add a functional dependency constraint, each determinant value
+        maps to a single dependent value
+        :param determinant: an str with the determinant column name
+        :param dependent: an str with the dependent column name
+        :return: an updated multi column constraints list
+        """
+        return self._add("functional_dependency", [determinant, dependent])
+
+    def _add(self, constraint_type: str, columns: list) -> list:
+        """Add a multi column constraint if it does not exist"""
+        new_constraint = {
+            "name": f"{constraint_type}: {', '.join(columns)}",
+            "type": constraint_type,
+            "columns": list(columns),
+        }
+        if new_constraint in self.multi_constraints:
+            print(f"{new_constraint} already exists.")
+        else:
+            self.multi_constraints.append(new_constraint)
+        return self.multi_constraints
+
+    def delete_multi_constraint(self, name: str) -> list:
+        """
+        Delete a multi column constraint
+        :param: an str with the name of the constraint
+        :return: an updated multi column constraints list
+        """
+        self.multi_constraints = [
+            constraint
+            for constraint in self.multi_constraints
+            if constraint["name"] != name
+        ]
+        return self.multi_constraints
+
+    def generate_constraints(self, data: pd.DataFrame) -> list:
+        """
+        Discover composite keys of two columns that are unique while
+        neither column is, and functional dependencies between columns.
+        Float columns are not considered. Every column is factorized once,
+        pairs are compared on combined codes of the two columns and nulls
+        count as a value of their own.
+        :param data: a pandas DataFrame
+        :return: a list with multi column constraints
+        """
+        columns = [
+            col
+            for col in data.columns
+            if not pd.api.types.is_float_dtype(data[col])
+        ]
+        nr_rows = len(data)
+        codes, distinct = {}, {}
+        for col in columns:
+            col_codes, uniques = pd.factorize(data[col])
+            # null rows get code 0, values 1 to len(uniques)
+            codes[col] = (col_codes.astype(np.int64) + 1, len(uniques) + 1)
+            distinct[col] = len(uniques) + int((col_codes == -1).any())
+        unique_cols = {col for col in columns if distinct[col] == nr_rows}
+        for pos, left in enumerate(columns):
+            for right in columns[pos + 1 :]:
+                if {left, right} & unique_cols:
+                    continue
+                if distinct[left] * distinct[right] < nr_rows:
+                    continue
+                if _pair_count(codes[left], codes[right]) == nr_rows:
+                    self.add_composite_unique([left, right])
+        for determinant in columns:
+            if determinant in unique_cols or (
+                distinct[determinant] > nr_rows * MAX_DETERMINANT_RATIO
+            ):
+                continue
+            for dependent in columns:
+                if dependent == determinant or distinct[dependent] <= 1:
+                    continue
+                if distinct[determinant] == _pair_count(
+                    codes[determinant], codes[dependent]
+                ):
+                    self.add_functional_dependency(determinant, dependent)
+        return self.multi_constraints
+
+    def save_as(self, save_as: str):
+        """
+        Save constraints to file
+        :param save_as: an str with json file name
+        :returns: saves a json file to local disk
+        """
+        if save_as.endswith(".json"):
+            with open(save_as, "w", encoding="utf-8") as s_file:
+                json.dump(
+                    self.multi_constraints, s_file, indent=4, cls=TypeEncoder
+                )
+        else:
+            raise ValueError("Save values can be 'json'")
+
+    def read_constraints(self, file_name: str):
+        """
+        Read constraints from file
+        :param file_name: an str with json file name
+        :returns: a list with multi column constraints
+        """
+        with open(file_name, "r", encoding="utf-8") as read_file:
+            self.multi_constraints = json.loads(read_file.read())
+        return self.multi_constraints
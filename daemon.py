@@ -0,0 +1,532 @@
+"""This module runs a local daemon that validates files landing in folders
+
+Watched directories are followed with inotify on Linux, or by polling on
+other systems. New files go into a bounded priority queue and are
+validated by a pool of long-lived worker processes that keep the parsed
+constraints between files. Summaries are written next to each other in an
+output directory with an atomic rename, so readers never see a partial
+file. Throughput and latency metrics are served as json on localhost.
+"""
+
+import ctypes
+import ctypes.util
+import fnmatch
+import hashlib
+import itertools
+import json
+import os
+import queue
+import select
+import struct
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Union
+import numpy as np
+from constraints import StandardConstraints
+from batch import verify_path
+
+PATTERNS = ("*.csv", "*.xlsx", "*.parquet")
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+EVENT_HEADER = struct.Struct("iIII")
+LATENCY_SAMPLES = 1000
+
+
+@lru_cache(maxsize=8)
+def _load_constraints(constraints_file: str, _mtime: float) -> dict:
+    """
+    Read a constraints file once per worker and file version, the
+    modification time is only part of the cache key
+    """
+    return StandardConstraints().read_constraints(constraints_file)
+
+
+def _warm_worker(constraints_file: str):
+    """Worker initializer, parses the constraints before the first file"""
+    _load_constraints(constraints_file, os.path.getmtime(constraints_file))
+
+
+def _write_atomic(text: str, target: str):
+    """Write a text file through a temporary file and a rename"""
+    handle, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(target), prefix=".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(handle, "w", encoding="utf-8") as out_file:
+            out_file.write(text)
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def result_path(file_path: str, output_dir: str) -> str:
+    """
+    Get the summary file of a data file. The name holds a hash of the
+    file directory, so files of the same name in different watched
+    directories do not share a summary.
+    :param file_path: an str path to a data file
+    :param output_dir: an str path to the output directory
+    :return: an str path to the summary csv file
+    """
+    directory, name = os.path.split(os.path.abspath(file_path))
+    digest = hashlib.sha1(os.fsencode(directory)).hexdigest()[:8]
+    return os.path.join(output_dir, f"{name}.{digest}.summary.csv")
+
+
+def _write_error(err: Exception, target: str):
+    """Write an error next to the summary file a validation would write"""
+    _write_atomic(
+        f"{type(err).__name__}: {err}\n",
+        target.replace(".summary.csv", ".error.txt"),
+    )
+
+
+def validate_to_file(
+    file_path: str,
+    constraints_file: str,
+    output_dir: str,
+    enforce_dtypes: bool = False,
+) -> float:
+    """
+    Validate a file and write its summary, runs in the worker process.
+    A failed validation writes the error to a .error.txt file instead, a
+    successful one removes the error file of an earlier failure.
+    :param file_path: an str path to csv, xlsx or parquet file
+    :param constraints_file: an str path to a csv or json constraints file
+    :param output_dir: an str path to the output directory
+    :param enforce_dtypes: a bool to enforce constraint dtypes
+    :return: a float with the validation seconds
+    """
+    start = time.perf_counter()
+    target = result_path(file_path, output_dir)
+    try:
+        constraints = _load_constraints(
+            constraints_file, os.path.getmtime(constraints_file)
+        )
+        summary = verify_path(file_path, constraints, enforce_dtypes)
+    except Exception as err:
+        _write_error(err, target)
+        raise
+    _write_atomic(summary.to_csv(), target)
+    try:
+        os.remove(target.replace(".summary.csv", ".error.txt"))
+    except FileNotFoundError:
+        pass
+    return time.perf_counter() - start
+
+
+def _inotify():
+    """Load the libc inotify functions, None if they are not available"""
+    library = ctypes.util.find_library("c")
+    if library is None:
+        return None
+    libc = ctypes.CDLL(library, use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        return None
+    libc.inotify_add_watch.argtypes = [
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_uint32,
+    ]
+    return libc
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serve the daemon metrics as json on GET /metrics"""
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        "Handle a GET request."
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = json.dumps(self.server.watch_daemon.metrics()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        "Keep request logs out of the daemon output."
+
+
+@dataclass
+class _Metrics:
+    """Thread safe counts and latency samples of the validated files"""
+
+    started: float = field(default_factory=time.monotonic)
+    done: int = 0
+    failed: int = 0
+    latency: deque = field(
+        default_factory=lambda: deque(maxlen=LATENCY_SAMPLES)
+    )
+    seconds: deque = field(
+        default_factory=lambda: deque(maxlen=LATENCY_SAMPLES)
+    )
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, seconds: float = None, latency: float = None):
+        """
+        Record a validated file, or a failed one without seconds
+        :param seconds: a float with the validation seconds
+        :param latency: a float with the seconds from queued to written
+        """
+        with self.lock:
+            if seconds is None:
+                self.failed += 1
+                return
+            self.done += 1
+            self.seconds.append(seconds)
+            self.latency.append(latency)
+
+    def snapshot(self) -> dict:
+        """
+        Get the file counts, throughput and latency percentiles in seconds
+        of the latest files
+        """
+        with self.lock:
+            samples = {
+                "latency": np.array(self.latency),
+                "validation": np.array(self.seconds),
+            }
+            metrics = {"files_done": self.done, "files_failed": self.failed}
+        uptime = time.monotonic() - self.started
+        metrics["uptime"] = uptime
+        metrics["files_per_second"] = metrics["files_done"] / uptime
+        for name, values in samples.items():
+            for pct in (50, 95):
+                metrics[f"{name}_p{pct}"] = (
+                    float(np.percentile(values, pct)) if len(values) else None
+                )
+            metrics[f"{name}_max"] = (
+                float(values.max()) if len(values) else None
+            )
+        return metrics
+
+
+@dataclass
+class WatchDaemon:  # pylint: disable=too-many-instance-attributes
+    """
+    WatchDaemon class validates files that land in watched directories.
+    Directories are a list or a dict with a priority per directory, files
+    of lower priority values are validated first and in arrival order
+    within a priority. Files already validated, with a summary newer than
+    the file, are skipped on start. A file whose worker died is retried
+    once in a new pool. A file that fails gets a .error.txt and is
+    validated again when it changes or on the next start.
+    """
+
+    directories: Union[List[str], Dict[str, int]]
+    constraints_file: str
+    output_dir: str
+    patterns: tuple = PATTERNS
+    max_workers: int = None
+    queue_size: int = 1000
+    poll_interval: float = 1.0
+    polling: bool = False
+    metrics_port: int = None
+    enforce_dtypes: bool = False
+    _threads: list = field(default_factory=list, repr=False)
+
+    def __post_init__(self):
+        "Post init calculations."
+        if not isinstance(self.directories, dict):
+            self.directories = dict.fromkeys(self.directories, 0)
+        self.directories = {
+            os.path.abspath(path): priority
+            for path, priority in self.directories.items()
+        }
+        if os.path.abspath(self.output_dir) in self.directories:
+            raise ValueError("The output directory can not be watched")
+        self.max_workers = self.max_workers or os.cpu_count() or 1
+        self.queue = queue.PriorityQueue(maxsize=self.queue_size)
+        self.metrics_address = None
+        self._counter = itertools.count()
+        self._pending = set()
+        self._retried = set()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self._stop = threading.Event()
+        self._executor = None
+        self._server = None
+        self._metrics = _Metrics()
+
+    def _matches(self, file_path: str) -> bool:
+        """Check a path is a data file and not a temporary file"""
+        name = os.path.basename(file_path)
+        return not name.startswith(".") and any(
+            fnmatch.fnmatch(name, pattern) for pattern in self.patterns
+        )
+
+    def _is_done(self, file_path: str) -> bool:
+        """Check a file already has a summary newer than itself"""
+        target = result_path(file_path, self.output_dir)
+        try:
+            return os.path.getmtime(target) >= os.path.getmtime(file_path)
+        except OSError:
+            return False
+
+    def enqueue(self, file_path: str, priority: int = None) -> bool:
+        """
+        Add a file to the queue, waits while the queue is full
+        :param file_path: an str path to a data file
+        :param priority: an int, the priority of its directory if None
+        :return: a bool, False if the file is ignored or already queued
+        """
+        file_path = os.path.abspath(file_path)
+        if not self._matches(file_path):
+            return False
+        if priority is None:
+            priority = self.directories.get(os.path.dirname(file_path), 0)
+        with self._lock:
+            if file_path in self._pending:
+                return False
+            self._pending.add(file_path)
+        item = (priority, next(self._counter), file_path, time.monotonic())
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=self.poll_interval)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _scan(self, done_check: bool = True):
+        """Enqueue the matching files of all watched directories"""
+        for directory, priority in self.directories.items():
+            with os.scandir(directory) as entries:
+                paths = sorted(
+                    entry.path for entry in entries if entry.is_file()
+                )
+            for path in paths:
+                if not (done_check and self._is_done(path)):
+                    self.enqueue(path, priority)
+
+    def _watch_inotify(self, libc):
+        """Follow closed and moved-in files with inotify"""
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        try:
+            directories = {}
+            for directory in self.directories:
+                wd = libc.inotify_add_watch(
+                    fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO
+                )
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), directory)
+                directories[wd] = directory
+            # files that landed before the watches were added
+            self._scan()
+            while not self._stop.is_set():
+                ready, _, _ = select.select([fd], [], [], self.poll_interval)
+                if not ready:
+                    continue
+                buffer = os.read(fd, 64 * 1024)
+                pos = 0
+                while pos < len(buffer):
+                    wd, mask, _, size = EVENT_HEADER.unpack_from(buffer, pos)
+                    start = pos + EVENT_HEADER.size
+                    name = buffer[start : start + size].rstrip(b"\0")
+                    pos = start + size
+                    if mask & IN_Q_OVERFLOW:
+                        self._scan()
+                    elif wd in directories and name:
+                        self.enqueue(
+                            os.path.join(directories[wd], os.fsdecode(name))
+                        )
+        finally:
+            os.close(fd)
+
+    def _watch_polling(self):
+        """
+        Poll the watched directories, a file is enqueued once its size and
+        modification time are the same in two scans in a row
+        """
+        previous, seen = {}, {}
+        self._scan()
+        while not self._stop.wait(self.poll_interval):
+            current = {}
+            for directory in self.directories:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_file() and self._matches(entry.path):
+                            stat = entry.stat()
+                            current[entry.path] = (stat.st_size, stat.st_mtime)
+            for path, state in sorted(current.items()):
+                if previous.get(path) == state and seen.get(path) != state:
+                    if not self._is_done(path):
+                        self.enqueue(path)
+                    seen[path] = state
+            previous = current
+            seen = {
+                path: state for path, state in seen.items() if path in current
+            }
+
+    def _watch(self):
+        """Watch the directories with inotify, or polling as a fallback"""
+        libc = None if self.polling else _inotify()
+        if libc is not None:
+            try:
+                self._watch_inotify(libc)
+                return
+            except OSError:
+                pass
+        self._watch_polling()
+
+    def _dispatch(self):
+        """Send queued files to the worker pool, one per free worker"""
+        while not self._stop.is_set():
+            try:
+                _, _, file_path, queued = self.queue.get(
+                    timeout=self.poll_interval
+                )
+            except queue.Empty:
+                continue
+            self._slots.acquire()  # pylint: disable=consider-using-with
+            try:
+                future = self._submit_restarting(file_path)
+            except Exception as err:  # pylint: disable=broad-except
+                # keep dispatching, the file is recorded as failed
+                self._slots.release()
+                with self._lock:
+                    self._pending.discard(file_path)
+                    self._retried.discard(file_path)
+                self._metrics.record()
+                try:
+                    _write_error(err, result_path(file_path, self.output_dir))
+                except OSError:
+                    pass
+                continue
+            future.add_done_callback(
+                lambda future, path=file_path, queued=queued: self._finish(
+                    future, path, queued
+                )
+            )
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        """Start worker processes that parse the constraints up front"""
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_warm_worker,
+            initargs=(self.constraints_file,),
+        )
+
+    def _submit_restarting(self, file_path: str):
+        """Send a file to the worker pool, restarting a broken pool once"""
+        try:
+            return self._submit(file_path)
+        except BrokenProcessPool:
+            # a worker died, e.g. out of memory, start a new pool
+            self._executor.shutdown(wait=False)
+            self._executor = self._new_pool()
+            return self._submit(file_path)
+
+    def _submit(self, file_path: str):
+        """Send a file to the worker pool"""
+        return self._executor.submit(
+            validate_to_file,
+            file_path,
+            self.constraints_file,
+            self.output_dir,
+            self.enforce_dtypes,
+        )
+
+    def _finish(self, future, file_path: str, queued: float):
+        """
+        Record the result of a validated file. A file whose worker died is
+        queued once more, the pool may have broken under another file.
+        """
+        self._slots.release()
+        error = None if future.cancelled() else future.exception()
+        with self._lock:
+            self._pending.discard(file_path)
+            retry = isinstance(error, BrokenProcessPool) and (
+                file_path not in self._retried
+            )
+            if retry:
+                self._retried.add(file_path)
+            else:
+                self._retried.discard(file_path)
+        if retry:
+            # enqueue waits while the queue is full, not in this thread
+            threading.Thread(
+                target=self.enqueue, args=(file_path,), daemon=True
+            ).start()
+        elif future.cancelled() or error is not None:
+            self._metrics.record()
+        else:
+            self._metrics.record(future.result(), time.monotonic() - queued)
+
+    def metrics(self) -> dict:
+        """
+        Get the daemon metrics
+        :return: a dict with file counts, queue size, throughput and
+        latency percentiles in seconds of the latest files
+        """
+        with self._lock:
+            pending = len(self._pending)
+        queued = self.queue.qsize()
+        metrics = self._metrics.snapshot()
+        metrics.update(queued=queued, in_flight=pending - queued)
+        return metrics
+
+    def start(self):
+        """Start the worker pool, the watcher and the metrics endpoint"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._stop.clear()
+        self._metrics = _Metrics()
+        self._executor = self._new_pool()
+        if self.metrics_port is not None:
+            self._server = ThreadingHTTPServer(
+                ("127.0.0.1", self.metrics_port), _MetricsHandler
+            )
+            self._server.watch_daemon = self
+            self.metrics_address = self._server.server_address
+            self._threads.append(
+                threading.Thread(
+                    target=self._server.serve_forever, daemon=True
+                )
+            )
+        self._threads.append(threading.Thread(target=self._dispatch))
+        self._threads.append(threading.Thread(target=self._watch))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """Stop watching, finish the files sent to workers and shut down"""
+        self._stop.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self._executor.shutdown(wait=True)
+
+    def run(self):
+        """Run until interrupted"""
+        self.start()
+        try:
+            while True:
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,156 @@
+"""This module provides mergeable distribution summaries for drift checks
+
+Histograms and category frequencies are plain dicts so they can be saved
+with the rest of the constraints. Summaries of different chunks of the
+same column can be merged by adding their counts. Histogram bin edges come
+from the column min and max, so chunks profiled separately are binned
+with the edges of the first profile, see constraint_edges.
+"""
+
+import pandas as pd
+import numpy as np
+
+NR_BINS = 20
+MAX_PSI = 0.2
+MAX_KS = 0.1
+EPSILON = 1e-4
+
+
+def histogram_edges(min_value: float, max_value: float) -> list:
+    """
+    Get the interior edges of equal width bins. The first and last bins
+    are open ended, so values outside [min_value, max_value] still count.
+    :param min_value: a float with the column min value
+    :param max_value: a float with the column max value
+    :return: a list with NR_BINS - 1 interior edges
+    """
+    if pd.isna(min_value) or pd.isna(max_value) or min_value == max_value:
+        return []
+    return np.linspace(min_value, max_value, NR_BINS + 1)[1:-1].tolist()
+
+
+def constraint_edges(constraints: dict) -> dict:
+    """
+    Get the histogram edges of a constraints dict, to profile other chunks
+    of the same data on the same bins
+    :param constraints: a constraints dict with histogram constraints
+    :return: a dict with the interior bin edges per column
+    """
+    return {
+        col: checks["histogram"]["edges"]
+        for col, checks in constraints.items()
+        if "histogram" in checks
+    }
+
+
+def bin_counts(values: pd.Series, edges: list) -> np.ndarray:
+    """
+    Count non null values per bin in a single vectorized pass
+    :param values: a numeric pandas Series
+    :param edges: a list of interior bin edges
+    :return: a numpy array with len(edges) + 1 counts
+    """
+    values = values.to_numpy(dtype="float64", na_value=np.nan)
+    values = values[~np.isnan(values)]
+    bins = np.searchsorted(edges, values, side="right")
+    return np.bincount(bins, minlength=len(edges) + 1)
+
+
+def histogram(values: pd.Series, edges: list) -> dict:
+    """
+    Get a binned histogram drift constraint
+    :param values: a numeric pandas Series
+    :param edges: a list of interior bin edges
+    :return: a dict with edges, counts and drift thresholds
+    """
+    return {
+        "edges": list(edges),
+        "counts": bin_counts(values, edges).tolist(),
+        "max_psi": MAX_PSI,
+        "max_ks": MAX_KS,
+    }
+
+
+def frequencies(values: pd.Series) -> dict:
+    """
+    Get a category frequencies drift constraint
+    :param values: a pandas Series
+    :return: a dict with counts per value and the drift threshold
+    """
+    counts = values.value_counts(dropna=True)
+    return {
+        "counts": {str(key): int(val) for key, val in counts.items()},
+        "max_psi": MAX_PSI,
+    }
+
+
+def merge_histograms(left: dict, right: dict) -> dict:
+    """
+    Merge two histograms of the same column with the same edges
+    :param left: a histogram dict
+    :param right: a histogram dict
+    :return: a histogram dict with added counts
+    """
+    if left["edges"] != right["edges"]:
+        raise ValueError(
+            "Histograms must have the same edges, profile the chunks with "
+            "the edges of the first"
+        )
+    counts = np.add(left["counts"], right["counts"]).tolist()
+    return {**left, "counts": counts}
+
+
+def merge_frequencies(left: dict, right: dict) -> dict:
+    """
+    Merge two category frequencies of the same column
+    :param left: a frequencies dict
+    :param right: a frequencies dict
+    :return: a frequencies dict with added counts
+    """
+    counts = dict(left["counts"])
+    for key, val in right["counts"].items():
+        counts[key] = counts.get(key, 0) + val
+    return {**left, "counts": counts}
+
+
+def quantiles(hist: dict, probs: list) -> list:
+    """
+    Approximate quantiles from a histogram, interpolating inside bins.
+    The open ended first and last bins are reported at their inner edge.
+    :param hist: a histogram dict
+    :param probs: a list of probabilities between 0 and 1
+    :return: a list of approximate quantiles
+    """
+    counts = np.asarray(hist["counts"], dtype="float64")
+    if not hist["edges"] or counts.sum() == 0:
+        return [np.nan] * len(probs)
+    edges = np.asarray(hist["edges"])
+    width = edges[1] - edges[0] if len(edges) > 1 else 0
+    bounds = np.concatenate([[edges[0] - width], edges, [edges[-1] + width]])
+    cdf = np.concatenate([[0], np.cumsum(counts) / counts.sum()])
+    result = np.interp(probs, cdf, bounds)
+    return np.clip(result, edges[0], edges[-1]).tolist()
+
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    """
+    Population stability index between two count arrays
+    :param expected: a numpy array with reference counts
+    :param actual: a numpy array with current counts
+    :return: a float with the PSI
+    """
+    expected = np.maximum(expected / max(expected.sum(), 1), EPSILON)
+    actual = np.maximum(actual / max(actual.sum(), 1), EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks(expected: np.ndarray, actual: np.ndarray) -> float:
+    """
+    Kolmogorov-Smirnov distance between two binned distributions
+    :param expected: a numpy array with reference counts
+    :param actual: a numpy array with current counts
+    :return: a float with the max distance between the binned CDFs
+    """
+    expected = np.cumsum(expected) / max(expected.sum(), 1)
+    actual = np.cumsum(actual) / max(actual.sum(), 1)
+    return float(np.max(np.abs(actual - expected)))
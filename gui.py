@@ -113,44 +113,6 @@ def get_constraints_dtypes(constraints: dict) -> dict:
     return new_dtypes
 
 
-class VerifierProgress(StandardVerifier):
-    """
-    Overrides StandardVerifier validation function to
-    incorporate GUI progress bar functionality
-    """
-
-    data: pd.DataFrame
-    constraints: dict
-    enforce_dtypes: bool = True
-
-    def __init__(self, data, constraints, enforce_dtypes):
-        super().__init__(data, constraints, enforce_dtypes)
-        self.validation_summary = self.__validate_data(self.enforce_dtypes)
-
-    def __validate_data(self, enforce_dtypes: bool = False) -> pd.DataFrame:
-        """
-        Override method to add gui progress bar
-        """
-        if enforce_dtypes:
-            enforced_dtypes = get_constraints_dtypes(self.constraints)
-            self.data = self.data.astype(enforced_dtypes)
-
-        verification = {}
-        progress = 0
-        nr_cols = len(self.data.columns)
-        for col_index, value in self.constraints.items():
-            progress += 100 / nr_cols
-            window["-PROG-"].Update(progress)
-            # pylint: disable=duplicate-code
-            verification[col_index] = {
-                check_key: self._call_checks(check_key)(
-                    self.constraints[col_index][check_key], col_index
-                )
-                for check_key, check_value in value.items()
-            }
-        return pd.DataFrame(verification)
-
-
 # Main loop
 def main():
     "Main GUI loop"
@@ -228,8 +190,13 @@ def main():
                 )
             if event == "Validate Data":
                 try:
-                    valid = VerifierProgress(
-                        frame, const.constraints, enforce_dtypes
+                    valid = StandardVerifier(
+                        frame,
+                        const.constraints,
+                        enforce_dtypes,
+                        progress_callback=lambda done: window["-PROG-"].Update(
+                            done * 100
+                        ),
                     )
                     v_update = update_table(
                         STANDARD_HEADINGS, valid.validation_summary
@@ -249,11 +216,9 @@ def main():
             row_data = v_update.filter(items=t_data_index, axis=0)
             if len(row_data) > 0:
                 row_data = row_data.to_dict(orient="records")[0]
-                validation_data = valid.validation_data[
-                    valid.validation_data["Validation"].str.contains(
-                        row_data["attribute"]
-                    )
-                ]
+                validation_data = valid.get_validation_data(
+                    row_data["attribute"]
+                )
                 view_validation_data(validation_data)
 
         # Custom constraints
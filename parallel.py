@@ -0,0 +1,231 @@
+"""This module provides deterministic parallel constraints discovery
+
+The DataFrame is written once to an uncompressed Arrow file. Worker
+processes memory-map that file and profile their own row range, so no
+DataFrame is pickled. The partial results are reduced in partition order
+into the same constraints dict as StandardConstraints.generate_constraints.
+"""
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+from pyarrow import feather
+from constraints import StandardConstraints, MAX_CATEGORIES
+
+
+def _read_partition(path: str, start: int, stop: int) -> pd.DataFrame:
+    """
+    Read a row range of the memory-mapped Arrow file
+    :param path: an str path to the Arrow file
+    :param start: an int with the first row
+    :param stop: an int with the row after the last row
+    :return: a DataFrame with the partition rows
+    """
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+        frame = table.slice(start, stop - start).to_pandas()
+    # arrow returns None for missing strings, pandas readers return NaN
+    for col in frame.select_dtypes(include=["object"]).columns:
+        frame[col] = frame[col].where(frame[col].notna(), np.nan)
+    return frame
+
+
+def _union(values: list) -> set:
+    """Union sets of values keeping a single np.nan for missing values"""
+    result = set()
+    has_nan = False
+    for partial in values:
+        for val in partial:
+            if isinstance(val, float) and np.isnan(val):
+                has_nan = True
+            else:
+                result.add(val)
+    if has_nan:
+        result.add(np.nan)
+    return result
+
+
+def _convert(frame: pd.DataFrame, categories: dict) -> pd.DataFrame:
+    """Apply the category or string decision to object columns"""
+    for col, is_category in categories.items():
+        frame[col] = frame[col].astype("category" if is_category else str)
+    return frame
+
+
+def _distinct_partition(path: str, start: int, stop: int) -> dict:
+    """Get up to MAX_CATEGORIES + 1 distinct values per object column"""
+    frame = _read_partition(path, start, stop)
+    return {
+        col: set(frame[col].unique()[: MAX_CATEGORIES + 1])
+        for col in frame.select_dtypes(include=["object"]).columns
+    }
+
+
+def _lengths(values: pd.Series, dropna: bool) -> tuple:
+    """Get the min and max length of values as str"""
+    if dropna:
+        values = values.dropna()
+    lengths = values.map(str).map(len)
+    if lengths.empty:
+        return None, None
+    return min(lengths), max(lengths)
+
+
+def _profile_partition(
+    path: str, start: int, stop: int, categories: dict
+) -> dict:
+    """
+    Profile a partition into mergeable partial constraints
+    :param path: an str path to the Arrow file
+    :param start: an int with the first row
+    :param stop: an int with the row after the last row
+    :param categories: a dict with the category decision per object column
+    :return: a dict with partial constraints per column
+    """
+    frame = _convert(_read_partition(path, start, stop), categories)
+    profiler = StandardConstraints()
+    partial = {
+        col: {
+            "data_type": profiler.get_data_type(frame, col),
+            "nullable": profiler.is_nullable(frame, col),
+        }
+        for col in frame.columns
+    }
+    for col in frame.select_dtypes(include=["category"]).columns:
+        partial[col]["min_length"] = _lengths(frame[col], dropna=True)[0]
+        partial[col]["max_length"] = _lengths(frame[col], dropna=False)[1]
+        partial[col]["value_range"] = profiler.value_range(frame, col)
+    for col in frame.select_dtypes(include=["string", "object"]).columns:
+        partial[col]["hashes"] = pd.util.hash_pandas_object(
+            frame[col], index=False
+        ).to_numpy()
+        partial[col]["min_length"] = _lengths(frame[col], dropna=True)[0]
+        partial[col]["max_length"] = _lengths(frame[col], dropna=False)[1]
+    for col in frame.select_dtypes(include=["number"]).columns:
+        partial[col]["min_value"] = profiler.min_value(frame, col)
+        partial[col]["max_value"] = profiler.max_value(frame, col)
+    for col in frame.select_dtypes(include=["datetime64"]).columns:
+        partial[col]["min_date"] = frame[col].min()
+        partial[col]["max_date"] = frame[col].max()
+    return partial
+
+
+def _reduce(values: list, func):
+    """Reduce partial values with min or max, skipping missing values"""
+    present = [val for val in values if val is not None and pd.notna(val)]
+    return func(present) if present else values[0]
+
+
+def _format_date(value):
+    """Format a date constraint like StandardConstraints.min_date"""
+    return value if pd.isna(value) else value.strftime("%Y-%m-%d")
+
+
+def _merge_column(
+    data: pd.DataFrame, col: str, parts: list, categories: dict
+) -> dict:
+    """
+    Merge the partial profiles of a column into its constraints
+    :param data: the profiled pandas DataFrame
+    :param col: an str with the column name
+    :param parts: a list with the partial profile of the column per
+    partition
+    :param categories: a dict with a bool per column, True for columns
+    converted to category
+    :return: a dict with the constraints of the column
+    """
+    constraints = {
+        "data_type": parts[0]["data_type"],
+        "nullable": np.any([part["nullable"] for part in parts]),
+    }
+    if "hashes" in parts[0]:
+        hashes = np.concatenate([part["hashes"] for part in parts])
+        unique = np.bool_(len(np.unique(hashes)) == len(hashes))
+        if not unique:
+            # equal hashes may be a collision, confirm on the values
+            values = _convert(data[[col]].copy(), {col: categories[col]})
+            unique = ~values[col].duplicated().any()
+        constraints["unique"] = unique
+    if "min_length" in parts[0]:
+        constraints["min_length"] = min(
+            part["min_length"]
+            for part in parts
+            if part["min_length"] is not None
+        )
+        constraints["max_length"] = _reduce(
+            [part["max_length"] for part in parts], max
+        )
+    if "value_range" in parts[0]:
+        constraints["value_range"] = _union(
+            [part["value_range"] for part in parts]
+        )
+    if "min_value" in parts[0]:
+        constraints["min_value"] = _reduce(
+            [part["min_value"] for part in parts], min
+        )
+        constraints["max_value"] = _reduce(
+            [part["max_value"] for part in parts], max
+        )
+    if "min_date" in parts[0]:
+        constraints["min_date"] = _format_date(
+            _reduce([part["min_date"] for part in parts], min)
+        )
+        constraints["max_date"] = _format_date(
+            _reduce([part["max_date"] for part in parts], max)
+        )
+    return constraints
+
+
+def profile_parallel(
+    data: pd.DataFrame, nr_partitions: int = None, max_workers: int = None
+) -> dict:
+    """
+    Discover standard constraints with a process pool. The result is
+    identical to StandardConstraints().generate_constraints(data).
+    :param data: a pandas DataFrame
+    :param nr_partitions: an int with the number of row ranges, defaults
+    to the number of CPUs
+    :param max_workers: an int with the max number of worker processes
+    :return: A dict with constraints
+    """
+    nr_partitions = min(nr_partitions or os.cpu_count() or 1, len(data))
+    bounds = np.linspace(0, len(data), max(nr_partitions, 1) + 1).astype(int)
+    starts, stops = bounds[:-1].tolist(), bounds[1:].tolist()
+
+    with tempfile.TemporaryDirectory() as tmp_dir, ProcessPoolExecutor(
+        max_workers=max_workers
+    ) as executor:
+        path = os.path.join(tmp_dir, "data.arrow")
+        feather.write_feather(
+            pa.Table.from_pandas(data, preserve_index=False),
+            path,
+            compression="uncompressed",
+        )
+        paths = [path] * len(starts)
+        distinct = list(
+            executor.map(_distinct_partition, paths, starts, stops)
+        )
+        categories = {
+            col: len(_union([part[col] for part in distinct]))
+            <= MAX_CATEGORIES
+            for col in distinct[0]
+        }
+        partials = list(
+            executor.map(
+                _profile_partition,
+                paths,
+                starts,
+                stops,
+                [categories] * len(starts),
+            )
+        )
+
+    return {
+        col: _merge_column(
+            data, col, [partial[col] for partial in partials], categories
+        )
+        for col in data.columns
+    }
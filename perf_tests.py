@@ -0,0 +1,268 @@
+"""Performance regression tests for discovery and verification
+
+Every operation runs at two data sizes. Run time has to scale close to
+linearly, peak traced memory has to stay within a multiple of the input
+size, and both are compared with the stored baseline. Baseline times are
+relative to a reference operation timed on the same machine, so the
+baseline holds across machines. Not part of the default unittest
+discovery, CI runs them as a separate step with:
+
+    python -m unittest perf_tests
+
+Set DVPY_UPDATE_BASELINE=1 to store new baseline values.
+"""
+
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import unittest
+import pandas as pd
+import numpy as np
+from constraints import StandardConstraints, CustomConstraints
+from verifiers import StandardVerifier, CustomVerifier
+
+SIZES = (20_000, 80_000)
+REPEATS = 3
+# allowed growth over linear between the two sizes, n log n checks and
+# cache effects fit, a quadratic check does not
+MAX_SCALING = 2.0
+# an operation is repeated until its runs add up to this, so fast checks
+# are timed above the timer resolution and fixed overhead
+MIN_SECONDS = 0.05
+MAX_MEMORY_RATIO = 6.0
+MIN_MEMORY_RATIO = 0.05
+MAX_BASELINE_TIME = 3.0
+MIN_RELATIVE_TIME = 0.01
+MAX_BASELINE_MEMORY = 1.5
+BASELINE_FILE = os.path.join("test_data", "perf_baseline.json")
+
+base = pd.read_csv(r"test_data/brain_stroke.csv")
+rules = CustomConstraints()
+rules.add_custom_constraint("old", "age > 80")
+rules.add_custom_constraint("risk", "hypertension == 1 and bmi > 30")
+rules.add_custom_constraint("work", "work_type in ['Private', 'children']")
+
+
+def make_frame(nr_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Build a test frame by resampling the brain stroke rows, with a unique
+    id and a date column
+    :param nr_rows: an int with the number of rows
+    :param seed: an int with the random seed
+    :return: a DataFrame
+    """
+    rng = np.random.default_rng(seed)
+    frame = base.iloc[rng.integers(0, len(base), nr_rows)]
+    frame = frame.reset_index(drop=True)
+    frame["id"] = pd.Series(np.arange(nr_rows)).astype(str).radd("ID")
+    frame["date"] = pd.Timestamp("2021-01-01") + pd.to_timedelta(
+        rng.integers(0, 365, nr_rows), unit="D"
+    )
+    return frame
+
+
+def reference_operation(frame: pd.DataFrame):
+    """Hash every row, the machine speed reference for the baseline"""
+    return pd.util.hash_pandas_object(frame, index=False)
+
+
+def time_once(operation, setup) -> float:
+    """
+    Time an operation per run, repeating it until the runs add up to
+    MIN_SECONDS
+    :param operation: a callable taking the setup result
+    :param setup: a callable preparing a fresh argument, not measured
+    :return: a float with the mean seconds per run
+    """
+    total = 0.0
+    runs = 0
+    while total < MIN_SECONDS:
+        argument = setup()
+        start = time.perf_counter()
+        operation(argument)
+        total += time.perf_counter() - start
+        runs += 1
+    return total / runs
+
+
+def measure(operation, setup) -> tuple:
+    """
+    Measure the best run time and the peak traced memory of an operation.
+    Memory is traced in a separate run, tracing slows down the timed runs.
+    :param operation: a callable taking the setup result
+    :param setup: a callable preparing a fresh argument, not measured
+    :return: a tuple with seconds and peak bytes
+    """
+    seconds = min(time_once(operation, setup) for _ in range(REPEATS))
+    argument = setup()
+    tracemalloc.start()
+    operation(argument)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def check_cases(frame: pd.DataFrame, reference_file: str) -> dict:
+    """
+    Get the column and constraint each StandardVerifier check runs with
+    :param frame: a DataFrame from make_frame
+    :param reference_file: an str path to a reference csv file
+    :return: a dict with a (column, constraint) tuple per check method
+    """
+    profile = StandardConstraints().generate_constraints(
+        frame.copy(), drift=True
+    )
+    return {
+        "check_data_type": ("gender", "category"),
+        "check_nullable": ("bmi", False),
+        "check_unique": ("id", True),
+        "check_max_length": ("work_type", 7),
+        "check_min_length": ("id", 4),
+        "check_value_range": ("smoking_status", ["never smoked", "smokes"]),
+        "check_max_value": ("avg_glucose_level", 200),
+        "check_min_value": ("age", 18),
+        "check_max_date": ("date", "2021-10-31"),
+        "check_min_date": ("date", "2021-02-28"),
+        "check_histogram": ("age", profile["age"]["histogram"]),
+        "check_frequencies": (
+            "work_type",
+            profile["work_type"]["frequencies"],
+        ),
+        "check_reference": (
+            "work_type",
+            {
+                "file": reference_file,
+                "column": "work_type",
+                "cache_dir": os.path.dirname(reference_file),
+            },
+        ),
+    }
+
+
+def run_benchmarks() -> dict:
+    """
+    Measure all operations at every size
+    :return: a dict with seconds and peak bytes per operation and size,
+    and the input bytes per size
+    """
+    results = {"input_bytes": {}}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        reference_file = os.path.join(tmp_dir, "work_types.csv")
+        base[["work_type"]].iloc[:100].to_csv(reference_file, index=False)
+        for size in SIZES:
+            frame = make_frame(size)
+            results["input_bytes"][size] = int(
+                frame.memory_usage(deep=True).sum()
+            )
+            operations = {
+                "reference": (reference_operation, lambda frame=frame: frame),
+                "generate_constraints": (
+                    lambda data: StandardConstraints().generate_constraints(
+                        data
+                    ),
+                    frame.copy,
+                ),
+                "CustomVerifier": (
+                    lambda data: CustomVerifier(
+                        data, rules.custom_constraints
+                    ),
+                    lambda frame=frame: frame,
+                ),
+            }
+            for name, (col, constraint) in check_cases(
+                frame, reference_file
+            ).items():
+                operations[name] = (
+                    lambda verifier, name=name, col=col, value=constraint: (
+                        getattr(verifier, name)(value, col)
+                    ),
+                    lambda frame=frame: StandardVerifier(
+                        frame, {}, keep_rows=False
+                    ),
+                )
+            for name, (operation, setup) in operations.items():
+                results.setdefault(name, {})[size] = measure(operation, setup)
+    return results
+
+
+class TestPerformance(unittest.TestCase):
+    """Performance regression tests"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Run the benchmarks once for all tests"""
+        cls.results = run_benchmarks()
+
+    def test_all_checks_covered(self):
+        """Test every StandardVerifier check has a benchmark"""
+        checks = [
+            name for name in dir(StandardVerifier) if name.startswith("check_")
+        ]
+        self.assertEqual(
+            sorted(checks),
+            sorted(name for name in self.results if name.startswith("check")),
+        )
+
+    def test_scaling(self):
+        """Test run time grows near linearly with the number of rows"""
+        small, large = SIZES[0], SIZES[-1]
+        for name, sizes in self.results.items():
+            if name == "input_bytes":
+                continue
+            with self.subTest(name):
+                growth = sizes[large][0] / sizes[small][0]
+                self.assertLessEqual(growth, large / small * MAX_SCALING)
+
+    def test_peak_memory(self):
+        """Test peak memory is bounded by a multiple of the input size"""
+        for name, sizes in self.results.items():
+            if name == "input_bytes":
+                continue
+            for size, (_, peak) in sizes.items():
+                with self.subTest(name, size=size):
+                    self.assertLessEqual(
+                        peak,
+                        self.results["input_bytes"][size] * MAX_MEMORY_RATIO,
+                    )
+
+    def test_baseline(self):
+        """Test the largest size against the stored baseline"""
+        size = SIZES[-1]
+        reference = self.results["reference"][size][0]
+        current = {
+            name: {
+                "relative_time": sizes[size][0] / reference,
+                "memory_ratio": sizes[size][1]
+                / self.results["input_bytes"][size],
+            }
+            for name, sizes in self.results.items()
+            if name not in ("input_bytes", "reference")
+        }
+        if os.environ.get("DVPY_UPDATE_BASELINE"):
+            with open(BASELINE_FILE, "w", encoding="utf-8") as out_file:
+                json.dump(current, out_file, indent=2, sort_keys=True)
+            return
+        if not os.path.exists(BASELINE_FILE):
+            self.skipTest(f"{BASELINE_FILE} not found")
+        with open(BASELINE_FILE, "r", encoding="utf-8") as in_file:
+            baseline = json.load(in_file)
+        for name, values in current.items():
+            if name not in baseline:
+                continue
+            with self.subTest(name):
+                self.assertLessEqual(
+                    values["relative_time"],
+                    max(baseline[name]["relative_time"], MIN_RELATIVE_TIME)
+                    * MAX_BASELINE_TIME,
+                )
+                self.assertLessEqual(
+                    values["memory_ratio"],
+                    max(baseline[name]["memory_ratio"], MIN_MEMORY_RATIO)
+                    * MAX_BASELINE_MEMORY,
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
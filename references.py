@@ -0,0 +1,107 @@
+"""This module loads reference tables for referential integrity checks
+
+Reference keys are read once, de-duplicated into a pandas Index with a
+hash engine, and cached in memory and on disk. The disk cache is keyed by
+the file path, column, size and modification time, so a changed reference
+file is reloaded and the cache of its older versions is removed.
+"""
+
+import os
+import glob
+import hashlib
+import tempfile
+import pandas as pd
+import numpy as np
+from utils import read_file
+
+CACHE_DIR = os.environ.get(
+    "DVPY_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "dv-py")
+)
+
+# one entry per reference file and column, with the cache key of the
+# version it holds, so a changed file replaces its old keys
+_references = {}
+
+
+def _sha1(raw: str) -> str:
+    """Hex sha1 digest of a string"""
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _cache_key(file_name: str, column: str) -> str:
+    """
+    Build a cache key that changes when the reference file changes. The
+    key starts with a hash of the file path and column, shared by every
+    version of the file, followed by a hash of its size and mtime.
+    """
+    stat = os.stat(file_name)
+    source = _sha1(f"{os.path.abspath(file_name)}|{column}")
+    return f"{source}.{_sha1(f'{stat.st_size}|{stat.st_mtime_ns}')}"
+
+
+def _write_cache(keys: pd.Series, cache_file: str):
+    """
+    Pickle the keys through a temporary file and a rename, so readers
+    never see a partial cache file, then remove the cache files of older
+    versions of the same reference.
+    """
+    cache_dir = os.path.dirname(cache_file)
+    os.makedirs(cache_dir, exist_ok=True)
+    handle, tmp_path = tempfile.mkstemp(
+        dir=cache_dir, prefix=".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(handle, "wb") as out_file:
+            keys.to_pickle(out_file)
+        os.replace(tmp_path, cache_file)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    source = os.path.basename(cache_file).split(".")[0]
+    for stale in glob.glob(os.path.join(cache_dir, f"{source}.*.pkl")):
+        if stale != cache_file:
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+
+
+def load_reference(
+    file_name: str, column: str, cache_dir: str = None
+) -> pd.Index:
+    """
+    Load the unique keys of a reference table column
+    :param file_name: an str path to a csv, xlsx or parquet reference file
+    :param column: an str with the key column name
+    :param cache_dir: an str directory for the disk cache, CACHE_DIR if None
+    :return: a pandas Index with the unique reference keys
+    """
+    key = _cache_key(file_name, column)
+    source = key.partition(".")[0]
+    if source in _references and _references[source][0] == key:
+        return _references[source][1]
+    cache_file = os.path.join(cache_dir or CACHE_DIR, f"{key}.pkl")
+    if os.path.exists(cache_file):
+        keys = pd.read_pickle(cache_file)
+    else:
+        frame = read_file(file_name, columns=[column])
+        keys = pd.Series(frame[column].dropna().unique())
+        _write_cache(keys, cache_file)
+    index = pd.Index(keys)
+    _references[source] = (key, index)
+    return index
+
+
+def in_reference(values: pd.Series, reference: pd.Index) -> pd.Series:
+    """
+    Vectorized membership of values in a reference index. Category
+    columns are looked up once per category instead of once per row.
+    :param values: a pandas Series
+    :param reference: a pandas Index from load_reference
+    :return: a boolean Series, True where the value is a reference key
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        found = reference.get_indexer(values.cat.categories) >= 0
+        found = np.append(found, False)
+        return pd.Series(found[values.cat.codes], index=values.index)
+    return pd.Series(reference.get_indexer(values) >= 0, index=values.index)
@@ -0,0 +1,347 @@
+"""This module compiles custom query rules to vectorized expressions
+
+A rule is parsed once, checked against the known columns and compiled to a
+code object that evaluates with pandas Series operators. The columns each
+rule depends on are extracted, so only those need to be read.
+"""
+
+import ast
+import io
+import re
+import tokenize
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Optional, Tuple
+import pandas as pd
+import numpy as np
+from utils import file_columns
+
+BACKTICK = re.compile(r"`([^`]*)`")
+# pandas query gives & and | the precedence of and/or, not the python one
+BOOLEAN_TOKENS = {"&": "and", "|": "or"}
+
+SQL_OPERATORS = {
+    ast.Add: "+",
+    ast.Sub: "-",
+    ast.Mult: "*",
+    ast.Div: "/",
+    ast.FloorDiv: "//",
+    ast.Mod: "%",
+    ast.Pow: "**",
+    ast.BitAnd: "AND",
+    ast.BitOr: "OR",
+    ast.And: "AND",
+    ast.Or: "OR",
+    ast.Eq: "=",
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Gt: ">",
+    ast.GtE: ">=",
+}
+
+ALLOWED_NODES = (
+    ast.Expression,
+    ast.BoolOp,
+    ast.And,
+    ast.Or,
+    ast.UnaryOp,
+    ast.Not,
+    ast.USub,
+    ast.UAdd,
+    ast.Invert,
+    ast.BinOp,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.FloorDiv,
+    ast.Mod,
+    ast.Pow,
+    ast.BitAnd,
+    ast.BitOr,
+    ast.Compare,
+    ast.Eq,
+    ast.NotEq,
+    ast.Lt,
+    ast.LtE,
+    ast.Gt,
+    ast.GtE,
+    ast.In,
+    ast.NotIn,
+    ast.Name,
+    ast.Load,
+    ast.Constant,
+    ast.List,
+    ast.Tuple,
+    ast.Attribute,
+    ast.Call,
+    ast.keyword,
+)
+
+
+class _QueryTransformer(ast.NodeTransformer):
+    """Rewrite pandas query semantics to elementwise Series operators"""
+
+    def visit_BoolOp(self, node):  # pylint: disable=invalid-name
+        "and/or to &/|"
+        node = self.generic_visit(node)
+        if isinstance(node.op, ast.And):
+            operator = ast.BitAnd()
+        else:
+            operator = ast.BitOr()
+        result = node.values[0]
+        for value in node.values[1:]:
+            result = ast.BinOp(left=result, op=operator, right=value)
+        return result
+
+    def visit_UnaryOp(self, node):  # pylint: disable=invalid-name
+        "not to ~"
+        node = self.generic_visit(node)
+        if isinstance(node.op, ast.Not):
+            return ast.UnaryOp(op=ast.Invert(), operand=node.operand)
+        return node
+
+    def visit_Compare(self, node):  # pylint: disable=invalid-name
+        "Split chained comparisons and map in/not in to isin"
+        node = self.generic_visit(node)
+        parts = []
+        left = node.left
+        for operator, right in zip(node.ops, node.comparators):
+            if isinstance(operator, (ast.In, ast.NotIn)):
+                part = ast.Call(
+                    func=ast.Attribute(left, "isin", ast.Load()),
+                    args=[right],
+                    keywords=[],
+                )
+                if isinstance(operator, ast.NotIn):
+                    part = ast.UnaryOp(op=ast.Invert(), operand=part)
+            else:
+                part = ast.Compare(
+                    left=left, ops=[operator], comparators=[right]
+                )
+            parts.append(part)
+            left = right
+        result = parts[0]
+        for part in parts[1:]:
+            result = ast.BinOp(left=result, op=ast.BitAnd(), right=part)
+        return result
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """
+    A custom query rule compiled to a vectorized expression.
+    """
+
+    query: str
+    columns: Tuple[str, ...]
+    names: Tuple[str, ...]
+    code: object
+
+    def __call__(self, data: pd.DataFrame) -> pd.Series:
+        """
+        Evaluate the rule on a DataFrame
+        :param data: a DataFrame with at least the rule columns
+        :return: a boolean Series, True where the rule matches
+        """
+        namespace = {
+            name: data[col] for name, col in zip(self.names, self.columns)
+        }
+        # pylint: disable=eval-used
+        result = eval(self.code, {"__builtins__": {}}, namespace)
+        if not isinstance(result, pd.Series):
+            result = pd.Series(bool(result), index=data.index)
+        return result.fillna(False).astype(bool)
+
+
+def _replace_booleans(source: str) -> str:
+    """
+    Replace & and | with and/or, as the pandas query parser does, so
+    "a == 0 & b == 1" compares before it combines
+    :param source: a rule str without backticks
+    :return: an str with the rewritten rule
+    """
+    tokens = []
+    for token in tokenize.generate_tokens(io.StringIO(source).readline):
+        if token.type == tokenize.OP and token.string in BOOLEAN_TOKENS:
+            tokens.append((tokenize.NAME, BOOLEAN_TOKENS[token.string]))
+        else:
+            tokens.append((token.type, token.string))
+    return tokenize.untokenize(tokens)
+
+
+def _parse_rule(query: str, columns: Tuple[str, ...]) -> tuple:
+    """
+    Parse a pandas query rule and check its syntax and columns
+    :param query: a pandas query str
+    :param columns: a tuple with the known column names
+    :return: a tuple with the ast tree, the names used in the tree and the
+    column each name refers to
+    """
+    quoted = {}
+
+    def quote(match):
+        name = f"__col_{len(quoted)}__"
+        quoted[name] = match.group(1)
+        return name
+
+    try:
+        source = _replace_booleans(BACKTICK.sub(quote, query).strip())
+        tree = ast.parse(source.strip(), mode="eval")
+    except (SyntaxError, tokenize.TokenError) as err:
+        raise ValueError(f"Unsupported rule syntax: {query}") from err
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"Unsupported rule syntax: {query}")
+        if isinstance(node, ast.Call) and not isinstance(
+            node.func, ast.Attribute
+        ):
+            raise ValueError(f"Unsupported rule syntax: {query}")
+        if isinstance(node, ast.Attribute) and node.attr.startswith("_"):
+            raise ValueError(f"Unsupported rule syntax: {query}")
+
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and node.id not in names:
+            names.append(node.id)
+    rule_columns = tuple(quoted.get(name, name) for name in names)
+    for col in rule_columns:
+        if col not in columns:
+            raise KeyError(col)
+    return tree, tuple(names), rule_columns
+
+
+@lru_cache(maxsize=None)
+def compile_rule(query: str, columns: Tuple[str, ...]) -> CompiledRule:
+    """
+    Parse, validate and compile a pandas query rule, once per query and
+    column set.
+    :param query: a pandas query str
+    :param columns: a tuple with the known column names
+    :return: a CompiledRule
+    :raises KeyError: if the rule uses a column that is not known
+    :raises ValueError: if the rule uses syntax the compiler does not support
+    """
+    tree, names, rule_columns = _parse_rule(query, columns)
+    tree = ast.fix_missing_locations(_QueryTransformer().visit(tree))
+    code = compile(tree, f"<rule {query}>", "eval")
+    return CompiledRule(query, rule_columns, names, code)
+
+
+def required_columns(rules: Iterable[dict], columns: Iterable[str]) -> list:
+    """
+    Get the columns needed to evaluate a list of custom constraints
+    :param rules: a list of custom constraint dicts with a query key
+    :param columns: the known column names, e.g. the standard constraints
+    :return: a list of column names in known column order
+    """
+    columns = tuple(columns)
+    needed = set()
+    for rule in rules:
+        needed.update(compile_rule(rule["query"], columns).columns)
+    return [col for col in columns if col in needed]
+
+
+def required_file_columns(
+    rules: Iterable[dict], file_path: str, keep: Iterable[str] = ()
+) -> Optional[list]:
+    """
+    Get the columns of a data file needed to evaluate custom constraints
+    :param rules: a list of custom constraint dicts with a query key
+    :param file_path: an str path to a csv, xlsx or parquet file
+    :param keep: column names to read as well, e.g. constrained columns
+    :return: a list of column names in file order, or None if a rule can
+    not be compiled and all columns have to be read
+    """
+    columns = file_columns(file_path)
+    try:
+        needed = set(required_columns(rules, columns))
+    except (KeyError, ValueError):
+        return None
+    needed.update(keep)
+    return [col for col in columns if col in needed]
+
+
+def sql_literal(value) -> str:
+    """
+    Format a python value as a SQL literal
+    :param value: a str, number, bool or None
+    :return: an str with the SQL literal
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, (bool, np.bool_)):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def sql_identifier(name: str) -> str:
+    """Quote a column name as a SQL identifier"""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _sql_comparison(left: str, operator: ast.cmpop, right) -> str:
+    """
+    Translate one comparison with pandas null semantics: a null compares
+    False, except for != and not in, where it compares True
+    """
+    if isinstance(operator, (ast.In, ast.NotIn)):
+        values = right if isinstance(right, list) else [right]
+        member = f"coalesce({left} IN ({', '.join(values)}), FALSE)"
+        if isinstance(operator, ast.NotIn):
+            return f"(NOT {member})"
+        return member
+    if isinstance(operator, ast.NotEq):
+        return f"({left} IS DISTINCT FROM {right})"
+    return f"coalesce({left} {SQL_OPERATORS[type(operator)]} {right}, FALSE)"
+
+
+def _to_sql(node: ast.AST, names: dict):
+    """Translate a parsed rule node to SQL"""
+    # pylint: disable=too-many-return-statements
+    if isinstance(node, ast.Expression):
+        return _to_sql(node.body, names)
+    if isinstance(node, ast.BoolOp):
+        operator = f" {SQL_OPERATORS[type(node.op)]} "
+        values = [_to_sql(value, names) for value in node.values]
+        return "(" + operator.join(values) + ")"
+    if isinstance(node, ast.UnaryOp):
+        operand = _to_sql(node.operand, names)
+        if isinstance(node.op, (ast.Not, ast.Invert)):
+            return f"(NOT {operand})"
+        return f"({'-' if isinstance(node.op, ast.USub) else '+'}{operand})"
+    if isinstance(node, ast.BinOp):
+        left, right = _to_sql(node.left, names), _to_sql(node.right, names)
+        return f"({left} {SQL_OPERATORS[type(node.op)]} {right})"
+    if isinstance(node, ast.Compare):
+        parts = []
+        left = _to_sql(node.left, names)
+        for operator, comparator in zip(node.ops, node.comparators):
+            right = _to_sql(comparator, names)
+            parts.append(_sql_comparison(left, operator, right))
+            left = right
+        return "(" + " AND ".join(parts) + ")"
+    if isinstance(node, ast.Name):
+        return sql_identifier(names[node.id])
+    if isinstance(node, ast.Constant):
+        return sql_literal(node.value)
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_to_sql(elt, names) for elt in node.elts]
+    raise ValueError(f"Unsupported rule syntax for SQL: {ast.dump(node)}")
+
+
+@lru_cache(maxsize=None)
+def rule_to_sql(query: str, columns: Tuple[str, ...]) -> str:
+    """
+    Translate a pandas query rule to a SQL boolean expression with the
+    same null semantics. Method calls are not supported.
+    :param query: a pandas query str
+    :param columns: a tuple with the known column names
+    :return: an str with the SQL expression
+    :raises KeyError: if the rule uses a column that is not known
+    :raises ValueError: if the rule uses syntax that can not be translated
+    """
+    tree, names, rule_columns = _parse_rule(query, columns)
+    return _to_sql(tree, dict(zip(names, rule_columns)))
@@ -0,0 +1,327 @@
+"""This module shares a loaded DataFrame with other local processes
+
+A dataset is read and parsed once and its column buffers are copied into a
+single multiprocessing.shared_memory block. Other processes attach to the
+block by name and get a read-only DataFrame whose columns are views of the
+shared buffers, so the data is neither parsed nor copied again.
+
+numpy, category and nullable columns keep their dtype. Object and string
+columns are shared as Arrow buffers and attach as string[pyarrow]; their
+original dtype is kept in the header, so verify_shared checks data_type
+against it and returns the same result as an in-process verification.
+"""
+
+import gc
+import sys
+import pickle
+from dataclasses import dataclass, field
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+from verifiers import StandardVerifier
+from utils import dtype_name
+
+ALIGNMENT = 64
+HEADER_BYTES = 8
+MASKED_ARRAYS = (
+    pd.arrays.IntegerArray,
+    pd.arrays.FloatingArray,
+    pd.arrays.BooleanArray,
+)
+
+
+def _align(offset: int) -> int:
+    """Round an offset up to the buffer alignment"""
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def _column_buffers(values: pd.Series) -> tuple:
+    """
+    Split a column into its raw buffers and the metadata to rebuild it
+    :param values: a pandas Series
+    :return: a tuple with a metadata dict and a list of buffers, None for
+    missing buffers
+    """
+    dtype = values.dtype
+    meta = {"length": len(values)}
+    if isinstance(dtype, pd.CategoricalDtype):
+        meta.update(
+            kind="category",
+            categories=dtype.categories,
+            ordered=dtype.ordered,
+            dtype=values.cat.codes.dtype.str,
+        )
+        return meta, [values.cat.codes.to_numpy()]
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        meta.update(kind="datetime_tz", tz=str(dtype.tz))
+        return meta, [values.to_numpy(dtype="datetime64[ns]").view("i8")]
+    if isinstance(values.array, pd.arrays.ArrowStringArray):
+        array = values.array._data.combine_chunks()  # pylint: disable=W0212
+    elif isinstance(dtype, pd.StringDtype) or dtype == object:
+        try:
+            array = pa.array(values, type=pa.string(), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as err:
+            raise ValueError(
+                f"Column '{values.name}' has values that are not str"
+            ) from err
+    elif isinstance(values.array, MASKED_ARRAYS):
+        meta.update(kind="masked", dtype=dtype.name)
+        # pylint: disable=protected-access
+        return meta, [values.array._data, values.array._mask]
+    else:
+        meta.update(kind="numpy", dtype=dtype.str)
+        return meta, [values.to_numpy()]
+    if array.offset:
+        array = pa.concat_arrays([array])
+    meta.update(
+        kind="string",
+        null_count=array.null_count,
+        source_dtype=dtype_name(dtype),
+    )
+    return meta, list(array.buffers())
+
+
+def _column_from_buffers(meta: dict, buffers: list) -> pd.Series:
+    """Rebuild a column from the metadata and views of its buffers"""
+    kind = meta["kind"]
+    if kind == "string":
+        array = pa.Array.from_buffers(
+            pa.string(),
+            meta["length"],
+            [None if buf is None else pa.py_buffer(buf) for buf in buffers],
+            meta["null_count"],
+        )
+        return pd.arrays.ArrowStringArray(pa.chunked_array([array]))
+    views = []
+    for buf, dtype in zip(buffers, _buffer_dtypes(meta)):
+        view = np.frombuffer(buf, dtype=dtype, count=meta["length"])
+        view.flags.writeable = False
+        views.append(view)
+    if kind == "category":
+        dtype = pd.CategoricalDtype(meta["categories"], meta["ordered"])
+        return pd.Categorical.from_codes(views[0], dtype=dtype)
+    if kind == "datetime_tz":
+        return pd.arrays.DatetimeArray(
+            views[0].view("datetime64[ns]"),
+            dtype=pd.DatetimeTZDtype(tz=meta["tz"]),
+        )
+    if kind == "masked":
+        array_type = pd.api.types.pandas_dtype(meta["dtype"])
+        return array_type.construct_array_type()(
+            views[0], views[1], copy=False
+        )
+    return views[0]
+
+
+def _buffer_dtypes(meta: dict) -> list:
+    """Get the numpy dtype of each buffer of a non string column"""
+    kind = meta["kind"]
+    if kind == "datetime_tz":
+        return ["i8"]
+    if kind == "masked":
+        dtype = pd.api.types.pandas_dtype(meta["dtype"])
+        return [dtype.numpy_dtype, np.bool_]
+    return [meta["dtype"]]
+
+
+def _to_bytes(buffer) -> np.ndarray:
+    """View a numpy array or Arrow buffer as bytes"""
+    if buffer is None:
+        return None
+    if isinstance(buffer, np.ndarray):
+        return np.ascontiguousarray(buffer).view(np.uint8).reshape(-1)
+    return np.frombuffer(buffer, dtype=np.uint8)
+
+
+@dataclass
+class SharedFrame:
+    """
+    SharedFrame class holds a DataFrame in a shared memory block. The
+    process that shares the data owns the block and unlinks it on close.
+    """
+
+    shm: SharedMemory
+    owner: bool = False
+    _data: pd.DataFrame = field(default=None, repr=False)
+
+    @property
+    def name(self) -> str:
+        """The shared memory block name other processes attach with"""
+        return self.shm.name
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """
+        A read-only DataFrame with views of the shared buffers. Drop all
+        references to it before closing the SharedFrame.
+        """
+        if self._data is None:
+            self._data = self._read()
+        return self._data
+
+    @property
+    def dtypes(self) -> dict:
+        """
+        The dtype names the string columns had in the sharing process,
+        before they were shared as Arrow strings
+        """
+        header = self._header()[0]
+        return {
+            col: meta["source_dtype"]
+            for col, meta in zip(header["columns"], header["meta"])
+            if "source_dtype" in meta
+        }
+
+    def _header(self) -> tuple:
+        """Read the header and the offset of the first buffer"""
+        buf = self.shm.buf
+        size = int(np.frombuffer(buf, dtype=np.uint64, count=1)[0])
+        header = pickle.loads(buf[HEADER_BYTES : HEADER_BYTES + size])
+        return header, _align(HEADER_BYTES + size)
+
+    def _read(self) -> pd.DataFrame:
+        """Rebuild the DataFrame from the shared block"""
+        buf = self.shm.buf
+        header, start = self._header()
+        index = header["index"]
+        if index is None:
+            index = pd.RangeIndex(header["nr_rows"])
+        columns = {}
+        for col, meta in zip(header["columns"], header["meta"]):
+            buffers = [
+                None
+                if span is None
+                else buf[start + span[0] : start + span[0] + span[1]]
+                for span in meta["spans"]
+            ]
+            columns[col] = pd.Series(
+                _column_from_buffers(meta, buffers),
+                index=index,
+                name=col,
+                copy=False,
+            )
+        return pd.DataFrame(columns, index=index, copy=False)
+
+    def close(self):
+        """Release the block, and unlink it if this process shared it"""
+        self._data = None
+        # pandas objects can keep views alive in reference cycles
+        gc.collect()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def share_frame(data: pd.DataFrame, name: str = None) -> SharedFrame:
+    """
+    Copy a DataFrame into a new shared memory block
+    :param data: a pandas DataFrame, object columns must hold str values
+    :param name: an str with the block name, a random name if None
+    :return: a SharedFrame owning the block
+    """
+    metas, buffers = [], []
+    offset = 0
+    for col in data.columns:
+        meta, col_buffers = _column_buffers(data[col].reset_index(drop=True))
+        meta["spans"] = []
+        for buffer in map(_to_bytes, col_buffers):
+            if buffer is None:
+                meta["spans"].append(None)
+                continue
+            meta["spans"].append((offset, buffer.nbytes))
+            buffers.append((offset, buffer))
+            offset = _align(offset + buffer.nbytes)
+        metas.append(meta)
+    index = None
+    if not data.index.equals(pd.RangeIndex(len(data))):
+        index = data.index
+    header = pickle.dumps(
+        {
+            "columns": list(data.columns),
+            "meta": metas,
+            "nr_rows": len(data),
+            "index": index,
+        }
+    )
+    start = _align(HEADER_BYTES + len(header))
+    shm = SharedMemory(name=name, create=True, size=max(start + offset, 1))
+    shm.buf[:HEADER_BYTES] = np.uint64(len(header)).tobytes()
+    shm.buf[HEADER_BYTES : HEADER_BYTES + len(header)] = header
+    for buf_offset, buffer in buffers:
+        position = start + buf_offset
+        shm.buf[position : position + buffer.nbytes] = buffer
+    return SharedFrame(shm, owner=True)
+
+
+def attach_frame(name: str, untrack: bool = False) -> SharedFrame:
+    """
+    Attach to a DataFrame shared by another process
+    :param name: an str with the shared memory block name
+    :param untrack: a bool for processes not started by the sharing
+    process, before python 3.13 their resource tracker would unlink the
+    block when they exit
+    :return: a SharedFrame, its data is a read-only view of the block
+    """
+    if sys.version_info >= (3, 13):
+        # track was added in python 3.13
+        shm = SharedMemory(  # pylint: disable=unexpected-keyword-arg
+            name=name, track=False
+        )
+    else:
+        shm = SharedMemory(name=name)
+        if untrack:
+            resource_tracker.unregister(
+                shm._name, "shared_memory"  # pylint: disable=W0212
+            )
+    return SharedFrame(shm)
+
+
+@dataclass
+class SharedVerifier(StandardVerifier):
+    """
+    The SharedVerifier class verifies an attached DataFrame, checking the
+    data_type of string columns against their dtype in the sharing process
+    """
+
+    source_dtypes: dict = field(default_factory=dict)
+
+    def check_data_type(self, constraint: str, col: str) -> bool:
+        """Check data type against constraint"""
+        if col in self.source_dtypes:
+            return self.source_dtypes[col] != constraint
+        return super().check_data_type(constraint, col)
+
+
+def verify_shared(
+    name: str, constraints: dict, enforce_dtypes: bool = False
+) -> pd.DataFrame:
+    """
+    Verify a shared DataFrame, e.g. in a worker process
+    :param name: an str with the shared memory block name
+    :param constraints: a standard constraints dict
+    :param enforce_dtypes: a bool to enforce constraint dtypes on a copy
+    :return: a DataFrame with the validation summary
+    """
+    shared = attach_frame(name)
+    try:
+        verifier = SharedVerifier(
+            shared.data,
+            constraints,
+            enforce_dtypes,
+            keep_rows=False,
+            # enforced dtypes replace the shared ones
+            source_dtypes={} if enforce_dtypes else shared.dtypes,
+        )
+        summary = verifier.validation_summary
+        del verifier
+    finally:
+        shared.close()
+    return summary
@@ -0,0 +1,102 @@
+"""This module provides bounded memory sketches for constraints discovery"""
+
+from dataclasses import dataclass, field
+import pandas as pd
+import numpy as np
+
+CHUNK_SIZE = 1_000_000
+
+
+def _hash_values(values: pd.Series) -> np.ndarray:
+    """Hash series values to uint64, nulls hash to a single value"""
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+@dataclass
+class HyperLogLog:
+    """
+    HyperLogLog distinct count estimator. Registers are a fixed size
+    uint8 array, so memory does not grow with the number of rows.
+    """
+
+    precision: int = 14
+    registers: np.ndarray = field(default=None, repr=False)
+
+    def __post_init__(self):
+        "Post init calculations."
+        if self.registers is None:
+            self.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self) -> float:
+        """Standard error of the distinct count estimate"""
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def update(self, values: pd.Series) -> "HyperLogLog":
+        """
+        Add the values of a Series to the sketch, in chunks.
+        :param values: a pandas Series
+        :return: the updated sketch
+        """
+        bits = np.uint64(64 - self.precision)
+        for start in range(0, len(values), CHUNK_SIZE):
+            hashed = _hash_values(values.iloc[start : start + CHUNK_SIZE])
+            index = (hashed >> bits).astype(np.intp)
+            rest = hashed << np.uint64(self.precision)
+            bit_length = np.zeros(len(rest), dtype=np.int64)
+            nonzero = rest > 0
+            bit_length[nonzero] = (
+                np.floor(np.log2(rest[nonzero].astype(np.float64))) + 1
+            )
+            rank = np.minimum(64 - bit_length + 1, int(bits) + 1)
+            np.maximum.at(self.registers, index, rank.astype(np.uint8))
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """
+        Merge another sketch of the same precision into this one.
+        :param other: a HyperLogLog sketch
+        :return: the merged sketch
+        """
+        if other.precision != self.precision:
+            raise ValueError("Sketches must have the same precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self) -> float:
+        """Estimate the number of distinct values added to the sketch"""
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        raw = alpha * size**2 / np.sum(
+            np.power(2.0, -self.registers.astype(np.float64))
+        )
+        zeros = np.count_nonzero(self.registers == 0)
+        if raw <= 2.5 * size and zeros > 0:
+            return size * np.log(size / zeros)
+        return raw
+
+
+def reservoir_sample(
+    values: pd.Series, size: int = 1000, seed: int = 0
+) -> np.ndarray:
+    """
+    Uniform sample of at most size values, without replacement. Every row
+    gets a random key and the smallest keys are kept chunk by chunk, so
+    memory is bounded by the sample and chunk size.
+    :param values: a pandas Series
+    :param size: an int with the max sample size
+    :param seed: an int seed for reproducible samples
+    :return: a numpy array with sampled values
+    """
+    rng = np.random.default_rng(seed)
+    sample_keys = np.empty(0)
+    sample = np.empty(0, dtype=object)
+    for start in range(0, len(values), CHUNK_SIZE):
+        chunk = values.iloc[start : start + CHUNK_SIZE].to_numpy(dtype=object)
+        keys = np.concatenate([sample_keys, rng.random(len(chunk))])
+        candidates = np.concatenate([sample, chunk])
+        if len(keys) > size:
+            keep = np.argpartition(keys, size)[:size]
+            keys, candidates = keys[keep], candidates[keep]
+        sample_keys, sample = keys, candidates
+    return sample
@@ -1,10 +1,44 @@
 """This module has unit tests for the dataframe_validation"""
 
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
 import pandas as pd
 import numpy as np
-from constraints import StandardConstraints, CustomConstraints
-from verifiers import StandardVerifier
+from constraints import (
+    StandardConstraints,
+    CustomConstraints,
+    MultiColumnConstraints,
+    diff_constraints,
+)
+from verifiers import (
+    StandardVerifier,
+    ChunkedVerifier,
+    CustomVerifier,
+    MultiColumnVerifier,
+    ParquetVerifier,
+)
+from sketches import HyperLogLog, reservoir_sample
+import drift
+from utils import iter_excel, optimize_memory, read_file
+from rules import compile_rule, required_columns, required_file_columns
+import references
+from backends import get_backend
+from batch import validate_files, verify_file
+from daemon import WatchDaemon, result_path
+from parallel import profile_parallel
+from shared import share_frame, attach_frame, verify_shared
+import cli
+from writers import write_validation_data, write_validation_summary
 
 # Testing data from Kaggle:
 # https://www.kaggle.com/datasets/jillanisofttech/brain-stroke-dataset
@@ -22,6 +56,657 @@ c.add_custom_constraint("rule2", "gender == 'Female'")
 c.add_custom_constraint("rule3", "gender == 'Male'")
 
 
+class TestBitmap(unittest.TestCase):
+    """Test cases for the violations bitmap"""
+
+    def test_bitmap(self):
+        """Test bitmap queries match the duplicated row results"""
+        verifier = StandardVerifier(d2.copy(), s.constraints)
+        lean = StandardVerifier(d2.copy(), s.constraints, keep_rows=False)
+        self.assertEqual(lean.failed_rows, [])
+        labels = verifier.validation_data["Validation"]
+        failing_age = verifier.validation_data.index[
+            labels.str.endswith(": age")
+        ].unique()
+        self.assertEqual(
+            sorted(d2.index[lean.violations.failing("age")]),
+            sorted(failing_age),
+        )
+        per_row = verifier.validation_data.index.value_counts()
+        self.assertEqual(
+            (lean.violations.count() >= 2).sum(), (per_row >= 2).sum()
+        )
+        self.assertEqual(
+            lean.violations.failing(check="nullable").sum(),
+            d2[["age", "Residence_type", "bmi"]].isna().any(axis=1).sum(),
+        )
+        pd.testing.assert_frame_equal(
+            lean.validation_data, verifier.validation_data
+        )
+        self.assertEqual(
+            len(lean.get_validation_data("age")),
+            labels.str.endswith(": age").sum(),
+        )
+
+
+class TestDrift(unittest.TestCase):
+    """Test cases for distribution drift constraints"""
+
+    def test_drift(self):
+        """Test drift discovery, merging and checks"""
+        drifted = StandardConstraints()
+        drifted.generate_constraints(d1.copy(), drift=True)
+        age = drifted.constraints["age"]["histogram"]
+        halves = [
+            drift.histogram(d1["age"][:2000], age["edges"]),
+            drift.histogram(d1["age"][2000:], age["edges"]),
+        ]
+        self.assertEqual(drift.merge_histograms(*halves), age)
+        ordered = d1.sort_values("age", ignore_index=True)
+        first, second = StandardConstraints(), StandardConstraints()
+        first.generate_constraints(ordered[:2000].copy(), drift=True)
+        second.generate_constraints(ordered[2000:].copy(), drift=True)
+        with self.assertRaises(ValueError):
+            drift.merge_histograms(
+                first.constraints["age"]["histogram"],
+                second.constraints["age"]["histogram"],
+            )
+        edges = drift.constraint_edges(first.constraints)
+        second.generate_constraints(
+            ordered[2000:].copy(), drift=True, edges=edges
+        )
+        self.assertEqual(
+            drift.merge_histograms(
+                first.constraints["age"]["histogram"],
+                second.constraints["age"]["histogram"],
+            ),
+            drift.histogram(d1["age"], edges["age"]),
+        )
+        self.assertAlmostEqual(
+            drift.quantiles(age, [0.5])[0], d1["age"].median(), delta=5
+        )
+        self.assertIn("frequencies", drifted.constraints["smoking_status"])
+
+        same = StandardVerifier(d2.copy(), drifted.constraints)
+        self.assertEqual(same.validation_summary.loc["histogram", "age"], 0)
+        self.assertEqual(
+            same.validation_summary.loc["frequencies", "gender"], 0
+        )
+        shifted = d2.copy()
+        shifted["age"] = shifted["age"] + 20
+        shifted.loc[:3000, "gender"] = "Female"
+        shift = StandardVerifier(shifted, drifted.constraints)
+        self.assertEqual(shift.validation_summary.loc["histogram", "age"], 1)
+        self.assertEqual(
+            shift.validation_summary.loc["frequencies", "gender"], 1
+        )
+        self.assertGreater(shift.drift_metrics["age"]["ks"], drift.MAX_KS)
+
+
+class TestRules(unittest.TestCase):
+    """Test cases for compiled custom rules"""
+
+    def test_compile_rule(self):
+        """Test compiled rules match DataFrame.query"""
+        columns = tuple(d1.columns)
+        for query in [
+            "age > 80",
+            "gender == 'Female'",
+            "age > 50 and not (gender == 'Male' or bmi < 20)",
+            "20 < age <= 30 and work_type in ['Private', 'Govt_job']",
+            "smoking_status not in ('Unknown',) and `avg_glucose_level` > 200",
+        ]:
+            rule = compile_rule(query, columns)
+            self.assertEqual(
+                d1.loc[rule(d1)].index.tolist(),
+                d1.query(query, engine="python").index.tolist(),
+            )
+        rule = compile_rule("age > 50 and gender == 'Female'", columns)
+        self.assertEqual(rule.columns, ("age", "gender"))
+        rule = compile_rule("age > 80", columns)
+        self.assertIs(compile_rule("age > 80", columns), rule)
+        with self.assertRaises(KeyError):
+            compile_rule("height > 2", columns)
+        with self.assertRaises(ValueError):
+            compile_rule("age > @limit", columns)
+        for query in [
+            "hypertension == 0 & heart_disease == 1",
+            "age > 50 & bmi < 30",
+            "age > 80 | bmi < 20 & gender == 'Male'",
+            "~(age > 50) & work_type in ['Private'] | stroke == 0",
+        ]:
+            rule = compile_rule(query, columns)
+            self.assertEqual(
+                d1.loc[rule(d1)].index.tolist(), d1.query(query).index.tolist()
+            )
+        verifier = CustomVerifier(d1, c.custom_constraints)
+        self.assertEqual(
+            verifier.validation_summary["count"].tolist(),
+            [d1.query(con["query"]).shape[0] for con in c.custom_constraints],
+        )
+
+    def test_required_columns(self):
+        """Test only the rule columns are read from parquet"""
+        needed = required_columns(c.custom_constraints, s.constraints)
+        self.assertEqual(needed, ["gender", "age"])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            parquet_file = os.path.join(tmp_dir, "data.parquet")
+            pd.read_csv("test_data/brain_stroke.csv").to_parquet(parquet_file)
+            frame = read_file(parquet_file, columns=needed)
+        self.assertEqual(frame.columns.tolist(), needed)
+        self.assertEqual(
+            CustomVerifier(frame, c.custom_constraints)
+            .validation_summary["count"]
+            .tolist(),
+            CustomVerifier(d1, c.custom_constraints)
+            .validation_summary["count"]
+            .tolist(),
+        )
+
+    def test_custom_rule_reads(self):
+        """Test custom rule paths read only the columns the rules use"""
+        data_file = "test_data/brain_stroke.csv"
+        self.assertEqual(
+            required_file_columns(c.custom_constraints, data_file),
+            ["gender", "age"],
+        )
+        self.assertIsNone(
+            required_file_columns([{"query": "age > @limit"}], data_file)
+        )
+        with mock.patch("utils.read_file", wraps=read_file) as reader:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                rules_file = os.path.join(tmp_dir, "custom.json")
+                c.save_as(rules_file)
+                cli.main(["validate-custom", data_file, rules_file])
+        self.assertEqual(reader.call_args[1]["columns"], ["gender", "age"])
+        constraints = {"bmi": s.constraints["bmi"]}
+        with mock.patch("backends.read_file", wraps=read_file) as reader:
+            summary, custom = get_backend("pandas").verify(
+                data_file, constraints, c.custom_constraints
+            )
+        self.assertEqual(
+            reader.call_args[1]["columns"], ["gender", "age", "bmi"]
+        )
+        self.assertEqual(summary.columns.tolist(), ["bmi"])
+        self.assertEqual(
+            custom["count"].tolist(),
+            CustomVerifier(d1, c.custom_constraints)
+            .validation_summary["count"]
+            .tolist(),
+        )
+
+
+class TestMultiColumn(unittest.TestCase):
+    """Test cases for multi column constraints"""
+
+    def test_multi_column(self):
+        """Test composite key and functional dependency discovery and checks"""
+        frame = pd.DataFrame(
+            {
+                "patient_id": [1, 1, 2, 2, 3, 3],
+                "date": ["d1", "d2", "d1", "d2", "d1", "d2"],
+                "ward": ["a", "a", "b", "b", "a", "a"],
+            }
+        )
+        multi = MultiColumnConstraints()
+        multi.generate_constraints(frame)
+        self.assertEqual(
+            [con["name"] for con in multi.multi_constraints],
+            [
+                "composite_unique: patient_id, date",
+                "functional_dependency: patient_id, ward",
+            ],
+        )
+        bad = pd.concat([frame, frame.iloc[[0]]], ignore_index=True)
+        bad.loc[5, "ward"] = "b"
+        verifier = MultiColumnVerifier(bad, multi.multi_constraints)
+        self.assertEqual(verifier.validation_summary["count"].tolist(), [1, 2])
+        self.assertEqual(verifier.validation_data.index.tolist(), [6, 4, 5])
+
+
+class TestReferences(unittest.TestCase):
+    """Test cases for referential integrity checks"""
+
+    def test_reference(self):
+        """Test reference membership, caching and invalidation"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            ref_file = os.path.join(tmp_dir, "work_types.csv")
+            pd.DataFrame({"key": ["Private", "Govt_job", "children"]}).to_csv(
+                ref_file, index=False
+            )
+            constraint = {
+                "file": ref_file,
+                "column": "key",
+                "cache_dir": tmp_dir,
+            }
+            verifier = StandardVerifier(
+                d1.copy(), {"work_type": {"reference": constraint}}
+            )
+            expected = d1["work_type"].eq("Self-employed").sum()
+            self.assertEqual(
+                verifier.validation_summary.loc["reference", "work_type"],
+                expected,
+            )
+            plain = d1["work_type"].astype(str).replace("nan", np.nan)
+            found = references.in_reference(
+                plain, references.load_reference(ref_file, "key", tmp_dir)
+            )
+            self.assertEqual((plain.notna() & ~found).sum(), expected)
+
+            # pylint: disable=protected-access
+            loaded = len(references._references)
+            pd.DataFrame({"key": ["Private"]}).to_csv(ref_file, index=False)
+            os.utime(ref_file, ns=(0, 0))
+            reference = references.load_reference(ref_file, "key", tmp_dir)
+            self.assertEqual(reference.tolist(), ["Private"])
+            cache_files = [
+                name for name in os.listdir(tmp_dir) if name.endswith(".pkl")
+            ]
+            self.assertEqual(len(cache_files), 1)
+            self.assertEqual(len(references._references), loaded)
+
+
+class TestBackends(unittest.TestCase):
+    """Test cases for verification backends"""
+
+    def test_duckdb_backend(self):
+        """Test the duckdb scan returns the pandas summaries"""
+        try:
+            backend = get_backend("duckdb", threads=2)
+            backend.verify(d1.iloc[:1], {})
+        except ImportError:
+            self.skipTest("duckdb is not installed")
+        custom = c.custom_constraints + [
+            {"name": "rule4", "query": "gender != 'Male' and not bmi < 20"},
+            {
+                "name": "rule5",
+                "query": "hypertension == 0 & heart_disease == 1",
+            },
+        ]
+        summary, custom_summary = get_backend("pandas").verify(
+            d2.copy(), s.constraints, custom
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            parquet_file = os.path.join(tmp_dir, "data.parquet")
+            d2.to_parquet(parquet_file)
+            for source in (d2.copy(), parquet_file):
+                duck_summary, duck_custom = backend.verify(
+                    source, s.constraints, custom
+                )
+                checks = summary.drop(index="data_type")
+                pd.testing.assert_frame_equal(
+                    duck_summary.drop(index="data_type").astype(float),
+                    checks.astype(float),
+                )
+                pd.testing.assert_frame_equal(
+                    duck_custom.astype(str), custom_summary.astype(str)
+                )
+                self.assertEqual(
+                    duck_custom["count"].iloc[-1],
+                    len(d2.query(custom[-1]["query"])),
+                )
+
+
+class TestUtils(unittest.TestCase):
+    """Test cases for utils"""
+
+    def test_optimize_memory(self):
+        """Test constraint driven dtypes keep validation results"""
+        exact = StandardConstraints()
+        exact.generate_constraints(d1.copy())
+        frame, constraints, saved = optimize_memory(d2, exact.constraints)
+        pd.testing.assert_frame_equal(
+            StandardVerifier(frame, constraints).validation_summary,
+            StandardVerifier(d2, exact.constraints).validation_summary,
+        )
+        self.assertGreater(saved, 0)
+        self.assertEqual(frame["heart_disease"].dtype.name, "bool")
+        self.assertEqual(frame["hypertension"].dtype.name, "int8")
+        self.assertEqual(frame["gender"].dtype.name, "category")
+        self.assertEqual(constraints["hypertension"]["data_type"], "int8")
+        self.assertEqual(frame["age"].gt(80).sum(), d2["age"].gt(80).sum())
+        self.assertEqual(
+            frame["work_type"].isna().sum(), d2["work_type"].isna().sum()
+        )
+
+    def test_iter_excel(self):
+        """Test streamed xlsx batches are typed and verify like a frame"""
+        dtypes = {col: val["data_type"] for col, val in s.constraints.items()}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            excel_file = os.path.join(tmp_dir, "data.xlsx")
+            d2.to_excel(excel_file, index=False)
+            batches = list(iter_excel(excel_file, dtypes, batch_size=1000))
+            chunked = ChunkedVerifier(
+                iter_excel(excel_file, dtypes, batch_size=1000), s.constraints
+            )
+        self.assertEqual(len(batches), 5)
+        self.assertEqual(batches[-1].index[-1], len(d2) - 1)
+        self.assertEqual(batches[0]["gender"].dtype.name, "category")
+        frame = pd.concat(batches).astype(dtypes)
+        expected = StandardVerifier(frame, s.constraints).validation_summary
+        self.assertTrue(chunked.validation_summary.equals(expected))
+        self.assertEqual(chunked.validation_summary.loc["unique", "age"], 4872)
+
+
+class TestWriters(unittest.TestCase):
+    """Test cases for columnar writers"""
+
+    def test_write_validation(self):
+        """Test streamed break details match validation_data"""
+        verifier = StandardVerifier(d2.copy(), s.constraints)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            breaks_file = os.path.join(tmp_dir, "breaks.parquet")
+            ids_file = os.path.join(tmp_dir, "ids.feather")
+            summary_file = os.path.join(tmp_dir, "summary.parquet")
+            written = write_validation_data(verifier, breaks_file)
+            lean = StandardVerifier(d2.copy(), s.constraints, keep_rows=False)
+            self.assertEqual(write_validation_data(lean, ids_file), written)
+            write_validation_data(verifier, ids_file, ids_only=True)
+            write_validation_summary(verifier, summary_file)
+            breaks = pd.read_parquet(breaks_file)
+            ids = pd.read_feather(ids_file)
+            summary = pd.read_parquet(summary_file).set_index("attribute")
+        self.assertEqual(written, len(verifier.validation_data))
+        self.assertEqual(len(breaks), len(verifier.validation_data))
+        self.assertEqual(breaks["Validation"].dtype.name, "category")
+        self.assertEqual(
+            ids["row"].tolist(), verifier.validation_data.index.tolist()
+        )
+        self.assertEqual(summary.loc["age", "nullable"], 5)
+
+    def test_write_null_first_check(self):
+        """Test a column all null in the first failing rows keeps its type"""
+        data = pd.DataFrame({"a": [None, None, "x", "y"], "b": [1, 2, 3, 100]})
+        constraints = {"a": {"nullable": False}, "b": {"max_value": 10}}
+        for keep_rows in (True, False):
+            verifier = StandardVerifier(data, constraints, keep_rows=keep_rows)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                for file_name in ("breaks.parquet", "breaks.feather"):
+                    breaks_file = os.path.join(tmp_dir, file_name)
+                    self.assertEqual(
+                        write_validation_data(verifier, breaks_file), 3
+                    )
+                breaks = pd.read_feather(breaks_file)
+            self.assertEqual(breaks["a"].tolist(), [None, None, "y"])
+
+
+class TestBatch(unittest.TestCase):
+    """Test cases for batch validation"""
+
+    def test_validate_files(self):
+        """Test batch validation of a list of files"""
+        constraints = StandardConstraints(
+            {col: dict(checks) for col, checks in s.constraints.items()}
+        )
+        constraints.modify_constraint(
+            "date", {"data_type": "datetime64[ns]", "max_date": "2022-01-01"}
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            constraints_file = os.path.join(tmp_dir, "constraints.json")
+            constraints.save_as(constraints_file)
+            broken_file = os.path.join(tmp_dir, "broken.csv")
+            pd.DataFrame({"x": [1]}).to_csv(broken_file, index=False)
+            report = validate_files(
+                [
+                    "test_data/brain_stroke.csv",
+                    "test_data/brain_stroke_bad.csv",
+                    broken_file,
+                ],
+                constraints_file,
+                max_workers=2,
+            )
+        files = report.index.get_level_values("file").unique().tolist()
+        self.assertEqual(len(files), 3)
+        bad = report.loc["test_data/brain_stroke_bad.csv"]
+        self.assertEqual(bad.loc["nullable", "age"], 5)
+        self.assertEqual(bad.loc["unique", "age"], 4872)
+        self.assertEqual(
+            bad.loc["max_date", "date"],
+            pd.to_datetime(d2["date"]).gt("2022-01-01").sum(),
+        )
+        self.assertTrue(
+            report.loc[(broken_file, "error"), "error"].startswith("KeyError")
+        )
+
+
+class TestParallel(unittest.TestCase):
+    """Test cases for parallel constraints discovery"""
+
+    def test_profile_parallel(self):
+        """Test parallel discovery matches serial discovery"""
+        for file_name in ["brain_stroke", "brain_stroke_bad"]:
+            data = pd.read_csv(f"test_data/{file_name}.csv")
+            serial = StandardConstraints().generate_constraints(data.copy())
+            for nr_partitions in [1, 3]:
+                self.assertEqual(
+                    profile_parallel(data, nr_partitions, max_workers=2),
+                    serial,
+                )
+
+
+class TestShared(unittest.TestCase):
+    """Test cases for shared memory datasets"""
+
+    def test_share_frame(self):
+        """Test attached frames are read-only views verified like a copy"""
+        data = d2.copy()
+        data["date"] = pd.to_datetime(data["date"])
+        data["gender"] = data["gender"].astype("category")
+        with share_frame(data) as owner:
+            attached = attach_frame(owner.name)
+            self.assertEqual(attached.dtypes["work_type"], "object")
+            frame = attached.data
+            self.assertFalse(frame["age"].to_numpy().flags.writeable)
+            self.assertEqual(frame["work_type"].dtype.name, "string")
+            pd.testing.assert_frame_equal(
+                frame.astype({"work_type": object}),
+                data.astype({"work_type": object}),
+                check_dtype=False,
+            )
+            verifier = StandardVerifier(frame, s.constraints)
+            expected = verifier.validation_summary
+            del frame, verifier
+            attached.close()
+            with ProcessPoolExecutor(max_workers=2) as executor:
+                summary = executor.submit(
+                    verify_shared, owner.name, s.constraints
+                ).result()
+        self.assertTrue(summary.equals(expected))
+
+    def test_verify_shared(self):
+        """Test a shared DataFrame verifies like the DataFrame itself"""
+        bad = pd.read_csv("test_data/brain_stroke_bad.csv")
+        bad["id"] = pd.Series(np.arange(len(bad)) % 50).astype(str)
+        profile = StandardConstraints()
+        profile.generate_constraints(d1.assign(id=bad["id"].iloc[:50]))
+        expected = StandardVerifier(
+            bad.copy(), profile.constraints
+        ).validation_summary
+        with share_frame(bad) as owner:
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                summary = executor.submit(
+                    verify_shared, owner.name, profile.constraints
+                ).result()
+        self.assertFalse(summary.loc["data_type", "id"])
+        pd.testing.assert_frame_equal(summary, expected)
+
+
+class TestDaemon(unittest.TestCase):
+    """Test cases for the watch folder daemon"""
+
+    def wait_for(self, daemon, files_done: int):
+        """Wait until the daemon has validated a number of files"""
+        deadline = time.monotonic() + 30
+        while daemon.metrics()["files_done"] < files_done:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.05)
+
+    def assert_summary(self, file_path: str, daemon):
+        """Test the summary the daemon wrote for a file"""
+        target = result_path(file_path, daemon.output_dir)
+        with open(target, "r", encoding="utf-8") as result:
+            self.assertEqual(
+                result.read(),
+                verify_file(file_path, daemon.constraints_file).to_csv(),
+            )
+
+    def test_watch_daemon(self):
+        """Test landed files are validated with inotify and by polling"""
+        bad_file = "test_data/brain_stroke_bad.csv"
+        for polling in (False, True):
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                watched = [
+                    os.path.join(tmp_dir, name) for name in ("in", "urgent")
+                ]
+                for directory in watched:
+                    os.makedirs(directory)
+                constraints_file = os.path.join(tmp_dir, "constraints.json")
+                s.save_as(constraints_file)
+                output_dir = os.path.join(tmp_dir, "results")
+                daemon = WatchDaemon(
+                    watched,
+                    constraints_file,
+                    output_dir,
+                    max_workers=1,
+                    poll_interval=0.1,
+                    polling=polling,
+                    metrics_port=0,
+                )
+                with daemon:
+                    for directory in watched:
+                        shutil.copy(bad_file, os.path.join(directory, "a.csv"))
+                    self.wait_for(daemon, 2)
+                    # pylint: disable=protected-access
+                    for process in daemon._executor._processes.values():
+                        process.kill()
+                    shutil.copy(bad_file, os.path.join(watched[0], "b.csv"))
+                    self.wait_for(daemon, 3)
+                    host, port = daemon.metrics_address
+                    with urllib.request.urlopen(
+                        f"http://{host}:{port}/metrics"
+                    ) as response:
+                        metrics = json.load(response)
+                    for directory in watched:
+                        self.assert_summary(
+                            os.path.join(directory, "a.csv"), daemon
+                        )
+                self.assertEqual(metrics["files_done"], 3)
+                self.assertEqual(metrics["files_failed"], 0)
+                self.assertGreater(metrics["latency_max"], 0)
+
+    def test_dispatch_failure(self):
+        """Test a file the pool rejects fails and dispatching goes on"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_file = os.path.join(tmp_dir, "a.csv")
+            shutil.copy("test_data/brain_stroke_bad.csv", data_file)
+            constraints_file = os.path.join(tmp_dir, "constraints.json")
+            s.save_as(constraints_file)
+            daemon = WatchDaemon(
+                [os.path.join(tmp_dir, "in")],
+                constraints_file,
+                os.path.join(tmp_dir, "results"),
+                max_workers=1,
+                poll_interval=0.1,
+                polling=True,
+            )
+            os.makedirs(os.path.join(tmp_dir, "in"))
+            errors = iter([BrokenProcessPool("dead"), BrokenProcessPool()])
+            submit = daemon._submit  # pylint: disable=protected-access
+
+            def flaky_submit(file_path):
+                error = next(errors, None)
+                if error is not None:
+                    raise error
+                return submit(file_path)
+
+            daemon._submit = flaky_submit  # pylint: disable=W0212
+            error_file = result_path(data_file, daemon.output_dir).replace(
+                ".summary.csv", ".error.txt"
+            )
+            with daemon:
+                daemon.enqueue(data_file)
+                deadline = time.monotonic() + 30
+                while daemon.metrics()["files_failed"] < 1:
+                    self.assertLess(time.monotonic(), deadline)
+                    time.sleep(0.05)
+                self.assertTrue(os.path.exists(error_file))
+                daemon.enqueue(data_file)
+                self.wait_for(daemon, 1)
+                self.assert_summary(data_file, daemon)
+            self.assertFalse(os.path.exists(error_file))
+
+
+class TestCli(unittest.TestCase):
+    """Test cases for the headless command line interface"""
+
+    startup_budget = 1.0
+
+    def test_startup(self):
+        """Test --help does not import pandas and stays within budget"""
+        lazy = subprocess.run(
+            [sys.executable, "-c", "import cli, sys; cli.build_parser(); "
+             "sys.exit('pandas' in sys.modules)"],
+            check=False,
+        )
+        self.assertEqual(lazy.returncode, 0)
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "cli", "--help"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        self.assertLess(time.perf_counter() - start, self.startup_budget)
+
+    def test_commands(self):
+        """Test profile, validate and validate-custom commands"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            constraints_file = os.path.join(tmp_dir, "constraints.json")
+            summary_file = os.path.join(tmp_dir, "summary.csv")
+            self.assertEqual(
+                cli.main(
+                    ["profile", "test_data/brain_stroke.csv", "-o",
+                     constraints_file]
+                ),
+                0,
+            )
+            self.assertEqual(
+                cli.main(
+                    ["validate", "test_data/brain_stroke_bad.csv",
+                     constraints_file, "-o", summary_file]
+                ),
+                1,
+            )
+            summary = pd.read_csv(summary_file, index_col=0)
+            self.assertEqual(summary.loc["nullable", "age"], "5")
+            with open(constraints_file, "w", encoding="utf-8") as out_file:
+                json.dump({"age": {"data_type": "int64"}}, out_file)
+            self.assertEqual(
+                cli.main(
+                    ["validate", "test_data/brain_stroke.csv",
+                     constraints_file, "-o", summary_file]
+                ),
+                1,
+            )
+            self.assertEqual(
+                cli.main(
+                    ["validate-custom", "test_data/brain_stroke.csv",
+                     "test_data/custom.json", "-o", summary_file]
+                ),
+                1,
+            )
+
+
+def comparable(constraints: dict) -> dict:
+    """Convert constraint values to str, sorting value_range sets"""
+    return {
+        col: {
+            key: sorted(map(str, val)) if isinstance(val, set) else str(val)
+            for key, val in checks.items()
+        }
+        for col, checks in constraints.items()
+    }
+
+
 class TestConstraints(unittest.TestCase):
     """Test cases for StandardConstraints"""
 
@@ -46,6 +731,50 @@ class TestConstraints(unittest.TestCase):
         )
         self.assertIs(type(s.constraints), dict)
 
+    def test_sketch_discovery(self):
+        """Test sketch based discovery matches the exact discovery"""
+        exact = StandardConstraints()
+        exact.generate_constraints(d1.copy())
+        sketched = StandardConstraints()
+        sketched.generate_constraints(d1.copy(), sketch=True)
+        self.assertEqual(
+            comparable(sketched.constraints), comparable(exact.constraints)
+        )
+        ids = pd.Series(np.arange(100_000).astype(str))
+        estimate = HyperLogLog().update(ids).estimate()
+        self.assertLess(abs(estimate - 100_000) / 100_000, 0.05)
+        merged = HyperLogLog().update(ids[:50_000])
+        merged.merge(HyperLogLog().update(ids[50_000:]))
+        self.assertEqual(merged.estimate(), estimate)
+        self.assertEqual(len(reservoir_sample(ids, 500)), 500)
+
+    def test_update_constraints(self):
+        """Test incremental discovery keeps overrides and matches a rerun"""
+        incremental = StandardConstraints()
+        incremental.generate_constraints(d1.drop(columns=["bmi"]))
+        incremental.modify_constraint("age", {"max_value": 100})
+        previous = incremental.constraints
+        data = d1.drop(columns=["stroke"])
+        self.assertEqual(incremental.changed_columns(data), ["bmi"])
+        incremental.update_constraints(data)
+        full = StandardConstraints()
+        full.generate_constraints(data.copy())
+        self.assertEqual(full.discovered["age"]["max_value"], 82)
+        full.modify_constraint("age", {"max_value": 100})
+        self.assertEqual(incremental.overrides, {"age": {"max_value": 100}})
+        self.assertEqual(
+            diff_constraints(full.constraints, incremental.constraints),
+            {"added": [], "removed": [], "changed": {}},
+        )
+        diff = diff_constraints(previous, incremental.constraints)
+        self.assertEqual(diff["added"], ["bmi"])
+        self.assertEqual(diff["removed"], ["stroke"])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            overrides_file = os.path.join(tmp_dir, "overrides.json")
+            incremental.save_overrides(overrides_file)
+            full.read_overrides(overrides_file)
+        self.assertEqual(full.overrides, incremental.overrides)
+
 
 class TestVerifier(unittest.TestCase):
     """Test cases for DataVerifier"""
@@ -81,6 +810,117 @@ class TestVerifier(unittest.TestCase):
             0,
         )
 
+    def test_progress_callback(self):
+        """Test progress is reported once per check from a single pass"""
+        progress = []
+        verifier = StandardVerifier(
+            d1, s.constraints, progress_callback=progress.append
+        )
+        total_checks = sum(len(val) for val in s.constraints.values())
+        self.assertEqual(len(progress), total_checks)
+        self.assertEqual(progress[-1], 1.0)
+        self.assertEqual(
+            len(verifier.validation_data),
+            len(StandardVerifier(d1, s.constraints).validation_data),
+        )
+
+    def test_date_checks(self):
+        """Test min and max date on naive and timezone aware columns"""
+        dates = d2.copy()
+        dates["date"] = pd.to_datetime(dates["date"])
+        verifier = StandardVerifier(dates, {"date": {"nullable": False}})
+        self.assertEqual(verifier.check_min_date("2021-12-31", "date"), 1)
+        self.assertEqual(verifier.check_max_date("2022-03-31", "date"), 2365)
+        dates["date"] = dates["date"].dt.tz_localize("US/Eastern")
+        verifier = StandardVerifier(dates, {"date": {"nullable": False}})
+        self.assertEqual(verifier.check_min_date("2021-12-31", "date"), 1)
+        self.assertEqual(
+            verifier.check_min_date("2021-12-31T04:00:00+00:00", "date"), 1
+        )
+        self.assertEqual(
+            verifier.check_min_date("2021-12-31T06:00:00+00:00", "date"),
+            dates["date"].lt("2021-12-31 01:00-05:00").sum(),
+        )
+
+    def test_column_shortcuts(self):
+        """Test per category and non null shortcuts keep the results"""
+        data = d2.astype({"work_type": "category", "gender": "category"})
+        shortcut = StandardVerifier(data, s.constraints)
+        expected = StandardVerifier(d2.copy(), s.constraints)
+        checks = ["nullable", "min_length", "max_length", "value_range"]
+        pd.testing.assert_frame_equal(
+            shortcut.validation_summary.loc[checks],
+            expected.validation_summary.loc[checks],
+            check_dtype=False,
+        )
+        self.assertEqual(
+            shortcut.validation_summary.loc["value_range"].sum(), 18
+        )
+
+    def test_parquet_pruning(self):
+        """Test row group pruning keeps the summary of the full read"""
+        data = d2.copy()
+        data["date"] = pd.Timestamp("2021-01-01") + pd.to_timedelta(
+            np.arange(len(data)) // 100, unit="D"
+        )
+        constraints = StandardConstraints().generate_constraints(data)
+        constraints["bmi"]["nullable"] = False
+        constraints["age"]["max_value"] = 80
+        constraints["date"]["max_date"] = "2021-01-30"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            parquet_file = os.path.join(tmp_dir, "data.parquet")
+            data.to_parquet(parquet_file, row_group_size=1000)
+            verifier = ParquetVerifier(parquet_file, constraints)
+            expected = StandardVerifier(
+                pd.read_parquet(parquet_file), constraints, keep_rows=False
+            )
+        pd.testing.assert_frame_equal(
+            verifier.validation_summary, expected.validation_summary
+        )
+        summary = verifier.validation_summary
+        self.assertGreater(summary.loc["max_date", "date"], 0)
+        self.assertEqual(verifier.decoded_row_groups["date"], [3, 4])
+
+    def test_violation_statistics(self):
+        """Test top values, grouped counts and examples match the rows"""
+        verifier = StandardVerifier(d2, s.constraints)
+        rows = verifier.validation_data
+        top = verifier.top_violations(k=2, col="age", check="unique")
+        expected = rows.loc[rows["Validation"] == "unique: age", "age"]
+        self.assertEqual(
+            top["count"].tolist(), expected.value_counts().head(2).tolist()
+        )
+        grouped = verifier.violations_by("gender")
+        expected = rows.groupby(["gender", "Validation"]).size()
+        self.assertEqual(grouped.loc["Male", "unique: age"], 2027)
+        self.assertEqual(
+            grouped.stack()[grouped.stack() > 0].sort_index().tolist(),
+            expected.sort_index().tolist(),
+        )
+        examples = verifier.example_rows(k=3, col="age")
+        self.assertEqual(examples["nullable: age"], [2, 9, 13])
+
+    def test_extension_dtypes(self):
+        """Test Arrow-backed and nullable dtypes match the numpy results"""
+        data = d2[["work_type", "bmi"]].copy()
+        data["work_type"] = data["work_type"].astype(str)
+        constraints = {
+            "work_type": {"max_length": 7, "min_length": 7},
+            "bmi": {"nullable": False, "max_value": 40},
+        }
+        expected = StandardVerifier(data, constraints).validation_summary
+        arrow = data.astype({"work_type": "string[pyarrow]", "bmi": "Float64"})
+        verifier = StandardVerifier(arrow, constraints)
+        pd.testing.assert_frame_equal(
+            verifier.validation_summary, expected, check_dtype=False
+        )
+        self.assertEqual(len(verifier.validation_data), expected.sum().sum())
+        discovered = StandardConstraints().generate_constraints(arrow)
+        self.assertEqual(
+            discovered["work_type"]["data_type"], "string[pyarrow]"
+        )
+        self.assertEqual(discovered["bmi"]["data_type"], "Float64")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,18 +1,26 @@
 # pylint: skip-file
 """ This module contains utility and helper functions"""
 import json
+from typing import Iterator, Tuple
 import pandas as pd
 import numpy as np
 
+INT_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+EXCEL_BATCH_SIZE = 50_000
+
 
 def read_file(
-    file_path: str, dtypes: dict = None, downcast: bool = False
+    file_path: str,
+    dtypes: dict = None,
+    downcast: bool = False,
+    columns: list = None,
 ) -> pd.DataFrame:
     """
-    Reads a csv or xlsx file
-    :param file_path: an str path to csv or xlsx file
+    Reads a csv, xlsx or parquet file
+    :param file_path: an str path to csv, xlsx or parquet file
     :param dtypes: a dictionary of data types
     :param downcast: a boolean to downcast data types
+    :param columns: a list of columns to read, all columns if None
     :returns: a DataFrame
     """
     if dtypes:
@@ -26,10 +34,22 @@ def read_file(
         non_dates = {}
         dates = {}
 
+    if columns is not None:
+        non_dates = {k: v for k, v in non_dates.items() if k in columns}
+        dates = {k: v for k, v in dates.items() if k in columns}
+
     if ".csv" in file_path:
-        frame = pd.read_csv(file_path, dtype=non_dates, sep=",")
+        frame = pd.read_csv(
+            file_path, dtype=non_dates, sep=",", usecols=columns
+        )
     elif ".xlsx" in file_path:
-        frame = pd.read_excel(file_path, dtype=non_dates)
+        frame = pd.concat(
+            iter_excel(file_path, columns=columns), ignore_index=True
+        )
+        frame = frame.astype(non_dates)
+    elif ".parquet" in file_path:
+        frame = pd.read_parquet(file_path, columns=columns)
+        frame = frame.astype(non_dates)
 
     for date in dates.keys():
         if pd.api.types.is_numeric_dtype(frame[date]):
@@ -51,17 +71,269 @@ def read_file(
                 frame[col] = pd.to_numeric(frame[col], downcast="integer")
             elif issubclass(frame[col].dtypes.type, np.float64):
                 frame[col] = pd.to_numeric(frame[col], downcast="float")
-            elif issubclass(frame[col].dtypes.type, np.object_) and (
-                len(frame[col].unique()) <= 20
-            ):
-                frame[col] = frame[col].astype("category")
-            elif issubclass(frame[col].dtypes.type, np.object_) and (
-                len(frame[col].unique()) > 20
-            ):
-                frame[col] = frame[col].astype(str)
+            elif issubclass(frame[col].dtypes.type, np.object_):
+                if len(frame[col].unique()) <= 20:
+                    frame[col] = frame[col].astype("category")
+                else:
+                    frame[col] = frame[col].astype(str)
+    return frame
+
+
+def file_columns(file_path: str) -> list:
+    """
+    Reads the column names of a csv, xlsx or parquet file without its rows
+    :param file_path: an str path to csv, xlsx or parquet file
+    :returns: a list of column names
+    """
+    if ".csv" in file_path:
+        return pd.read_csv(file_path, sep=",", nrows=0).columns.tolist()
+    if ".xlsx" in file_path:
+        return next(iter_excel(file_path, batch_size=1)).columns.tolist()
+    if ".parquet" in file_path:
+        import pyarrow.parquet as pq
+
+        schema = pq.read_schema(file_path)
+        index = schema.pandas_metadata or {}
+        index = [
+            col for col in index.get("index_columns", [])
+            if isinstance(col, str)
+        ]
+        return [name for name in schema.names if name not in index]
+    raise ValueError("File can be 'csv', 'xlsx' or 'parquet'")
+
+
+def constraint_dtypes(constraints: dict, dates_only: bool = False) -> dict:
+    """
+    Get the data types of the constraints, to read a file with
+    :param constraints: a constraints dict
+    :param dates_only: a bool to only get the datetime64[ns] columns, the
+    dates a csv file can not carry, and keep the inferred dtypes the
+    data_type checks compare
+    :returns: a dictionary of data types
+    """
+    return {
+        col: checks["data_type"]
+        for col, checks in constraints.items()
+        if "data_type" in checks
+        and (not dates_only or checks["data_type"] == "datetime64[ns]")
+    }
+
+
+def _typed_column(values: tuple, dtype: str = None) -> pd.Series:
+    """
+    Convert the cell values of a column to a typed Series. Values that do
+    not fit the dtype keep the inferred dtype, so the data_type check
+    reports them instead of the read failing.
+    :param values: a tuple with cell values
+    :param dtype: an str with the expected dtype or None to infer it
+    :returns: a Series
+    """
+    series = pd.Series(list(values), dtype=None if values else object)
+    if dtype is None or dtype == series.dtype.name:
+        return series
+    if dtype == "datetime64[ns]":
+        return pd.to_datetime(series, errors="ignore")
+    try:
+        return series.astype(dtype)
+    except (ValueError, TypeError):
+        return series
+
+
+def iter_excel(
+    file_path: str,
+    dtypes: dict = None,
+    columns: list = None,
+    batch_size: int = EXCEL_BATCH_SIZE,
+    sheet_name: str = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream an xlsx sheet in read-only mode as DataFrame batches, typed
+    with the constraint dtypes. Only one batch of rows is in memory at a
+    time and batches keep a running row index. Empty rows are skipped.
+    :param file_path: an str path to an xlsx file
+    :param dtypes: a dictionary of data types, e.g. from the constraints
+    :param columns: a list of columns to read, all columns if None
+    :param batch_size: an int with the number of rows per batch
+    :param sheet_name: an str with the sheet name, the first if None
+    :returns: an iterator of DataFrames
+    """
+    from openpyxl import load_workbook
+
+    dtypes = dtypes or {}
+    book = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheet = book[sheet_name] if sheet_name else book.worksheets[0]
+        sheet.reset_dimensions()
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(name) for name in next(rows, ())]
+        keep = [
+            pos
+            for pos, name in enumerate(header)
+            if columns is None or name in columns
+        ]
+        start = 0
+        batch = []
+        for row in rows:
+            if any(val is not None for val in row):
+                batch.append(row)
+            if len(batch) == batch_size:
+                yield _excel_batch(batch, header, keep, dtypes, start)
+                start += len(batch)
+                batch = []
+        if batch or start == 0:
+            yield _excel_batch(batch, header, keep, dtypes, start)
+    finally:
+        book.close()
+
+
+def _excel_batch(
+    batch: list, header: list, keep: list, dtypes: dict, start: int
+) -> pd.DataFrame:
+    """Convert a batch of xlsx rows to a typed DataFrame"""
+    width = len(header)
+    cells = [
+        tuple(row[:width]) + (None,) * (width - len(row)) for row in batch
+    ]
+    values = list(zip(*cells)) if cells else [()] * width
+    frame = pd.DataFrame(
+        {
+            header[pos]: _typed_column(values[pos], dtypes.get(header[pos]))
+            for pos in keep
+        }
+    )
+    frame.index = pd.RangeIndex(start, start + len(batch))
     return frame
 
 
+def optimize_memory(
+    frame: pd.DataFrame, constraints: dict
+) -> Tuple[pd.DataFrame, dict, int]:
+    """
+    Cast columns to the narrowest dtype that is safe for both the data and
+    the discovered constraints: bool for 0/1 integer columns, int8/16/32
+    from min_value/max_value, and fixed categories from value_range. Values
+    outside the constraints keep fitting in the new dtype, and the
+    data_type constraints of cast columns are rewritten, so verifying the
+    optimized frame with the returned constraints neither hides nor adds
+    breaks.
+    :param frame: a DataFrame
+    :param constraints: a constraints dict
+    :returns: a tuple with the optimized DataFrame, the constraints to
+    verify it with and the bytes saved
+    """
+    before = frame.memory_usage(deep=True).sum()
+    frame = frame.copy()
+    constraints = {col: dict(checks) for col, checks in constraints.items()}
+    for col, checks in constraints.items():
+        if col not in frame.columns:
+            continue
+        optimized = _narrow(frame[col], checks)
+        if optimized is None:
+            continue
+        if "data_type" in checks:
+            checks["data_type"] = _cast_data_type(
+                checks["data_type"], frame[col].dtype, optimized.dtype
+            )
+        frame[col] = optimized
+    after = frame.memory_usage(deep=True).sum()
+    return frame, constraints, int(before - after)
+
+
+def _cast_data_type(constraint: str, old_dtype, new_dtype) -> str:
+    """
+    Rewrite a data_type constraint for a column cast from old_dtype to
+    new_dtype, keeping the result of the data_type check
+    :param constraint: an str with the data_type constraint
+    :param old_dtype: the dtype of the column before the cast
+    :param new_dtype: the dtype of the column after the cast
+    :returns: an str with the new data_type constraint
+    """
+    if dtype_name(old_dtype) == constraint:
+        return dtype_name(new_dtype)
+    if dtype_name(new_dtype) == constraint:
+        # the old dtype broke the constraint, the new dtype must break it
+        return dtype_name(old_dtype)
+    return constraint
+
+
+def _narrow(series: pd.Series, checks: dict) -> pd.Series:
+    """
+    Cast a column to the narrowest dtype allowed by its constraints
+    :param series: a pandas Series
+    :param checks: the constraints dict of the column
+    :returns: the cast Series, or None if it can not be narrowed
+    """
+    if "value_range" in checks and not pd.api.types.is_numeric_dtype(series):
+        categories = series.astype("category")
+        allowed = {val for val in checks["value_range"] if pd.notna(val)}
+        if set(categories.cat.categories) <= allowed:
+            categories = categories.cat.set_categories(
+                sorted(allowed, key=str)
+            )
+        return categories
+    if series.empty or not pd.api.types.is_integer_dtype(series):
+        return None
+    if isinstance(series.dtype, pd.api.extensions.ExtensionDtype):
+        return None
+    low = min(series.min(), checks.get("min_value", series.min()))
+    high = max(series.max(), checks.get("max_value", series.max()))
+    if low >= 0 and high <= 1:
+        return series.astype(bool)
+    for dtype in INT_DTYPES:
+        if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+            return series.astype(dtype)
+    return None
+
+
+def group_codes(
+    frame: pd.DataFrame, columns: list
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Factorize the row tuples of several columns into int64 group codes,
+    re-factorizing after each column so the codes never overflow.
+    :param frame: a DataFrame
+    :param columns: a list of column names
+    :returns: a tuple with the group codes and a mask of rows with nulls
+    """
+    codes = np.zeros(len(frame), dtype=np.int64)
+    nulls = np.zeros(len(frame), dtype=bool)
+    for col in columns:
+        col_codes, uniques = pd.factorize(frame[col])
+        nulls |= col_codes == -1
+        codes = codes * (len(uniques) + 1) + (col_codes + 1)
+        codes = pd.factorize(codes)[0].astype(np.int64)
+    return codes, nulls
+
+
+def dtype_name(dtype) -> str:
+    """
+    Get the name of a dtype that astype accepts back, keeping the storage
+    of Arrow-backed strings
+    :param dtype: a numpy or pandas extension dtype
+    :returns: an str with the dtype name, e.g. int64 or string[pyarrow]
+    """
+    if isinstance(dtype, pd.StringDtype) and dtype.storage == "pyarrow":
+        return "string[pyarrow]"
+    return dtype.name
+
+
+def str_lengths(series: pd.Series) -> pd.Series:
+    """
+    Get the str length of each value. String extension dtypes use their
+    native kernel and categories are measured once per category, only
+    other dtypes are converted to str.
+    :param series: a pandas Series
+    :returns: a Series with lengths, missing where the value is missing
+    """
+    if isinstance(series.dtype, pd.StringDtype):
+        return series.str.len()
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        lengths = series.cat.categories.astype(str).str.len().to_numpy()
+        lengths = np.append(lengths.astype(float), np.nan)
+        return pd.Series(lengths[series.cat.codes], index=series.index)
+    return series.astype(str).str.len().where(series.notna())
+
+
 class TypeEncoder(json.JSONEncoder):
     """Custom encoder class for json"""
 
@@ -74,4 +346,6 @@ class TypeEncoder(json.JSONEncoder):
             return float(o)
         if isinstance(o, set):
             return list(o)
+        if o is pd.NA:
+            return None
         return super().default(o)
@@ -1,11 +1,49 @@
 """This module provides the basic objects for the dataframe_validation"""
 
 from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import Callable, Iterable, Optional
 import pandas as pd
+import numpy as np
+import drift as drift_stats
+from rules import compile_rule
+from utils import dtype_name, group_codes, str_lengths
+from references import load_reference, in_reference
+from bitmap import ViolationBitmap
+
+
+@lru_cache(maxsize=None)
+def _parse_date_bound(constraint: str, tz_name: Optional[str]) -> int:
+    """
+    Parse a date constraint into int64 nanoseconds, once per bound/timezone.
+    :param constraint: a date str constraint
+    :param tz_name: the column timezone name or None for naive columns
+    :return: an int with nanoseconds since epoch, or None for missing bounds
+    """
+    if pd.isna(constraint):
+        return None
+    bound = pd.Timestamp(constraint)
+    if tz_name is not None:
+        if bound.tzinfo is None:
+            bound = bound.tz_localize(tz_name)
+    elif bound.tzinfo is not None:
+        bound = bound.tz_convert("UTC").tz_localize(None)
+    return bound.value
+
+
+def _fill_mask(breaks: pd.Series) -> pd.Series:
+    """
+    Turn the missing results of nullable dtype comparisons into no break.
+    :param breaks: a bool or nullable boolean Series
+    :return: a bool Series
+    """
+    if breaks.dtype == bool:
+        return breaks
+    return breaks.fillna(False).astype(bool)
 
 
 @dataclass
-class StandardVerifier:
+class StandardVerifier:  # pylint: disable=too-many-instance-attributes
     """
     The DataVerifier class provides a way to verify constraints on a
     dataframe.
@@ -14,24 +52,138 @@ class StandardVerifier:
     data: pd.DataFrame
     constraints: dict
     enforce_dtypes: bool = False
+    progress_callback: Optional[Callable[[float], None]] = None
+    keep_rows: bool = True
 
     def __post_init__(self):
         "Post init calculations."
         self.failed_rows = []
+        self.violations = ViolationBitmap(len(self.data))
+        self._column_cache = {}
+        self.drift_metrics = {}
         self.validation_summary = self.__validate_data()
-        self.validation_data: pd.DataFrame = self.__get_validation_data()
+
+    def _add_breaks(self, breaks: pd.Series, check: str, col: str):
+        """
+        Record the failing rows of a check in the violations bitmap and,
+        with keep_rows, as a copy of the rows tagged with a Validation label
+        :param breaks: a boolean Series with one value per row
+        :param check: an str with the check name
+        :param col: an str with the column name
+        """
+        label = f"{check}: {col}"
+        breaks = _fill_mask(breaks)
+        self.violations.add(col, check, breaks, label)
+        if self.keep_rows:
+            rows = self.data.loc[breaks].copy()
+            rows["Validation"] = label
+            self.failed_rows.append(rows)
+
+    def _selected_bits(self, col: str = None, check: str = None) -> list:
+        """Get the bitmap positions and labels of the matching checks"""
+        return [
+            (bit, bit_col, label)
+            for bit, (bit_col, bit_check, label) in enumerate(
+                self.violations.checks
+            )
+            if col in (None, bit_col) and check in (None, bit_check)
+        ]
+
+    def top_violations(
+        self, k: int = 10, col: str = None, check: str = None
+    ) -> pd.DataFrame:
+        """
+        Gets the k most frequent failing values of each check, from the
+        violations bitmap without building the failing rows.
+        :param k: an int with the number of values per check
+        :param col: an str with the column name or None for all columns
+        :param check: an str with the check name or None for all checks
+        :returns: a DataFrame with Validation, value and count columns
+        """
+        tops = []
+        for bit, bit_col, label in self._selected_bits(col, check):
+            counts = self.data[bit_col][self.violations.mask(bit)]
+            counts = counts.value_counts(dropna=False).head(k)
+            tops.append(
+                pd.DataFrame(
+                    {
+                        "Validation": label,
+                        "value": counts.index.to_numpy(dtype=object),
+                        "count": counts.to_numpy(),
+                    }
+                )
+            )
+        if not tops:
+            return pd.DataFrame(columns=["Validation", "value", "count"])
+        return pd.concat(tops, ignore_index=True)
+
+    def violations_by(
+        self, by, col: str = None, check: str = None
+    ) -> pd.DataFrame:
+        """
+        Counts the failing rows of each check per group, e.g. per category
+        value or per month. Rows with a missing group are not counted.
+        :param by: an str column name or a Series aligned with the data,
+        e.g. data["date"].dt.to_period("M")
+        :param col: an str with the column name or None for all columns
+        :param check: an str with the check name or None for all checks
+        :returns: a DataFrame with a row per group and a column per check
+        """
+        if isinstance(by, str):
+            by = self.data[by]
+        codes, groups = pd.factorize(by, sort=True)
+        valid = codes >= 0
+        counts = {
+            label: np.bincount(
+                codes[valid & self.violations.mask(bit)],
+                minlength=len(groups),
+            )
+            for bit, _, label in self._selected_bits(col, check)
+        }
+        return pd.DataFrame(counts, index=pd.Index(groups, name=by.name))
+
+    def example_rows(
+        self, k: int = 5, col: str = None, check: str = None
+    ) -> dict:
+        """
+        Gets the index of the first k failing rows of each check
+        :param k: an int with the number of rows per check
+        :param col: an str with the column name or None for all columns
+        :param check: an str with the check name or None for all checks
+        :returns: a dict with a list of row ids per Validation label
+        """
+        return {
+            label: self.data.index[
+                np.flatnonzero(self.violations.mask(bit))[:k]
+            ].tolist()
+            for bit, _, label in self._selected_bits(col, check)
+        }
+
+    def get_validation_data(self, col: str = None) -> pd.DataFrame:
+        """
+        Gets the rows with validation breaks from the violations bitmap,
+        optionally only for the checks of one column.
+        :param col: an str with the column name or None for all columns
+        :returns: a DataFrame with rows of validation breaks
+        """
+        failed_data = [
+            self.data.loc[self.violations.mask(bit)].assign(Validation=label)
+            for bit, (bit_col, _, label) in enumerate(self.violations.checks)
+            if col in (None, bit_col)
+        ]
+        if not failed_data:
+            return self.data.iloc[:0].assign(Validation=pd.Series(dtype=str))
+        return pd.concat(failed_data)
 
     def check_data_type(self, constraint: str, col: str) -> bool:
         """Check data type against constraint"""
-        return self.data[col].dtype.name != constraint
+        return dtype_name(self.data[col].dtype) != constraint
 
     def check_nullable(self, constraint: bool, col: str) -> int:
         """Check null values against constraint"""
         if not constraint:
             breaks = self.data[col].isna()
-            rows = self.data.loc[breaks].copy()
-            rows["Validation"] = f"nullable: {col}"
-            self.failed_rows.append(rows)
+            self._add_breaks(breaks, "nullable", col)
         else:
             breaks = pd.Series(False)
         return breaks.sum()
@@ -40,87 +192,180 @@ class StandardVerifier:
         """Check duplicate values against constraint"""
         if constraint:
             breaks = (self.data[col].notna()) & (self.data[col].duplicated())
-            rows = self.data.loc[breaks].copy()
-            rows["Validation"] = f"unique: {col}"
-            self.failed_rows.append(rows)
+            self._add_breaks(breaks, "unique", col)
         else:
             breaks = pd.Series(False)
         return breaks.sum()
 
+    def _not_null(self, col: str) -> pd.Series:
+        """Get the non null mask of a column, once per column"""
+        if (col, "not_null") not in self._column_cache:
+            self._column_cache[col, "not_null"] = self.data[col].notna()
+        return self._column_cache[col, "not_null"]
+
+    def _str_lengths(self, col: str) -> pd.Series:
+        """
+        Get the str lengths of a column, once per column. Lengths of other
+        than string and category dtypes are only computed for non null rows.
+        """
+        if (col, "lengths") not in self._column_cache:
+            series = self.data[col]
+            if isinstance(series.dtype, (pd.StringDtype, pd.CategoricalDtype)):
+                lengths = str_lengths(series)
+            else:
+                not_null = self._not_null(col).to_numpy()
+                lengths = np.full(len(series), np.nan)
+                if not_null.any():
+                    lengths[not_null] = str_lengths(series[not_null])
+                lengths = pd.Series(lengths, index=series.index)
+            self._column_cache[col, "lengths"] = lengths
+        return self._column_cache[col, "lengths"]
+
     def check_max_length(self, constraint: int, col: str) -> int:
         """Check max length against constraint"""
         if not pd.api.types.is_numeric_dtype(self.data[col]):
-            breaks = (self.data[col].notna()) & (
-                self.data[col].astype(str).str.len() > constraint
-            )
-            rows = self.data.loc[breaks].copy()
-            rows["Validation"] = f"max_length: {col}"
-            self.failed_rows.append(rows)
+            lengths = self._str_lengths(col)
+            breaks = self._not_null(col) & (lengths > constraint)
+            self._add_breaks(breaks, "max_length", col)
             return breaks.sum()
         return None
 
     def check_min_length(self, constraint: int, col: str) -> int:
         """Check min length against constraint"""
         if not pd.api.types.is_numeric_dtype(self.data[col]):
-            breaks = (self.data[col].notna()) & (
-                self.data[col].astype(str).str.len() < constraint
-            )
-            rows = self.data.loc[breaks].copy()
-            rows["Validation"] = f"min_legth:{col}"
-            self.failed_rows.append(rows)
+            lengths = self._str_lengths(col)
+            breaks = self._not_null(col) & (lengths < constraint)
+            self._add_breaks(breaks, "min_length", col)
             return breaks.sum()
         return None
 
     def check_value_range(self, constraint: list, col: str) -> int:
-        """Check range of values against constraint"""
-        breaks = (self.data[col].notnull()) & (
-            ~self.data[col].isin(constraint)
-        )
-        rows = self.data.loc[breaks].copy()
-        rows["Validation"] = f"value_range: {col}"
-        self.failed_rows.append(rows)
+        """
+        Check range of values against constraint. Category columns are
+        checked once per category, the rows only if a category is not
+        allowed.
+        """
+        series = self.data[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            allowed = series.cat.categories.isin(list(constraint))
+            if allowed.all():
+                breaks = pd.Series(False, index=series.index)
+            else:
+                outside = np.append(~allowed, False)
+                breaks = pd.Series(
+                    outside[series.cat.codes], index=series.index
+                )
+        else:
+            breaks = self._not_null(col) & ~series.isin(constraint)
+        self._add_breaks(breaks, "value_range", col)
         return breaks.sum()
 
     def check_max_value(self, constraint: str, col: str):
         """Check max value against constraint"""
         breaks = self.data[col] > constraint
-        rows = self.data.loc[breaks].copy()
-        rows["Validation"] = f"max_value: {col}"
-        self.failed_rows.append(rows)
+        self._add_breaks(breaks, "max_value", col)
         return breaks.sum()
 
     def check_min_value(self, constraint: str, col: str):
         """Check min value against constraint"""
         breaks = self.data[col] < constraint
-        rows = self.data.loc[breaks].copy()
-        rows["Validation"] = f"max_value: {col}"
-        self.failed_rows.append(rows)
+        self._add_breaks(breaks, "min_value", col)
+        return breaks.sum()
+
+    def check_reference(self, constraint: dict, col: str) -> int:
+        """Check values exist in a reference table column"""
+        reference = load_reference(
+            constraint["file"],
+            constraint["column"],
+            constraint.get("cache_dir"),
+        )
+        found = in_reference(self.data[col], reference)
+        breaks = self.data[col].notna() & ~found
+        self._add_breaks(breaks, "reference", col)
         return breaks.sum()
 
+    def _date_breaks(self, min_date: str, max_date: str, col: str) -> dict:
+        """
+        Compute min_date and max_date breaks in one pass over the int64
+        nanosecond view of a datetime column. Timezone aware columns are
+        compared in UTC, naive bounds are localized to the column timezone.
+        :param min_date: a min date constraint or None
+        :param max_date: a max date constraint or None
+        :param col: an str with the column name
+        :return: a dict with min_date and max_date boolean break masks
+        """
+        key = (col, "dates", min_date, max_date)
+        if key not in self._column_cache:
+            series = self.data[col]
+            tz_name = None if series.dt.tz is None else str(series.dt.tz)
+            nanos = series.to_numpy(dtype="datetime64[ns]").view("i8")
+            valid = nanos != np.iinfo(np.int64).min
+            breaks = {}
+            for check, bound, compare in (
+                ("min_date", min_date, np.less),
+                ("max_date", max_date, np.greater),
+            ):
+                bound_ns = None
+                if bound is not None:
+                    bound_ns = _parse_date_bound(bound, tz_name)
+                if bound_ns is None:
+                    mask = np.zeros(len(nanos), dtype=bool)
+                else:
+                    mask = valid & compare(nanos, bound_ns)
+                breaks[check] = pd.Series(mask, index=series.index)
+            self._column_cache[key] = breaks
+        return self._column_cache[key]
+
     def check_min_date(self, constraint: str, col: str) -> int:
         """Check min date against constraint"""
-        if pd.api.types.is_datetime64_dtype(self.data[col]):
-            breaks = pd.to_datetime(
-                pd.Series(self.data[col], dtype="datetime64[ns]")
-            ) < pd.to_datetime(constraint)
-            rows = self.data.loc[breaks].copy()
-            rows["Validation"] = f"min_date: {col}"
-            self.failed_rows.append(rows)
+        if pd.api.types.is_datetime64_any_dtype(self.data[col]):
+            max_date = self.constraints.get(col, {}).get("max_date")
+            breaks = self._date_breaks(constraint, max_date, col)["min_date"]
+            self._add_breaks(breaks, "min_date", col)
             return breaks.sum()
         return None
 
     def check_max_date(self, constraint: str, col: str) -> int:
         """Check max date against constraint"""
-        if pd.api.types.is_datetime64_dtype(self.data[col]):
-            breaks = pd.to_datetime(
-                pd.Series(self.data[col], dtype="datetime64[ns]")
-            ) > pd.to_datetime(constraint)
-            rows = self.data.loc[breaks].copy()
-            rows["Validation"] = f"max_date: {col}"
-            self.failed_rows.append(rows)
+        if pd.api.types.is_datetime64_any_dtype(self.data[col]):
+            min_date = self.constraints.get(col, {}).get("min_date")
+            breaks = self._date_breaks(min_date, constraint, col)["max_date"]
+            self._add_breaks(breaks, "max_date", col)
             return breaks.sum()
         return None
 
+    def check_histogram(self, constraint: dict, col: str) -> int:
+        """Check numeric distribution drift against a histogram"""
+        expected = np.asarray(constraint["counts"])
+        actual = drift_stats.bin_counts(self.data[col], constraint["edges"])
+        metrics = {
+            "psi": drift_stats.psi(expected, actual),
+            "ks": drift_stats.ks(expected, actual),
+        }
+        self.drift_metrics[col] = metrics
+        return int(
+            metrics["psi"] > constraint.get("max_psi", drift_stats.MAX_PSI)
+            or metrics["ks"] > constraint.get("max_ks", drift_stats.MAX_KS)
+        )
+
+    def check_frequencies(self, constraint: dict, col: str) -> int:
+        """Check category distribution drift against frequencies"""
+        counts = self.data[col].value_counts(dropna=True)
+        actual = {}
+        for key, val in counts.items():
+            actual[str(key)] = actual.get(str(key), 0) + val
+        keys = list(dict.fromkeys([*constraint["counts"], *actual]))
+        metrics = {
+            "psi": drift_stats.psi(
+                np.array([constraint["counts"].get(key, 0) for key in keys]),
+                np.array([actual.get(key, 0) for key in keys]),
+            )
+        }
+        self.drift_metrics[col] = metrics
+        return int(
+            metrics["psi"] > constraint.get("max_psi", drift_stats.MAX_PSI)
+        )
+
     def _call_checks(self, check: str) -> dict:
         """
         Map constraint names with functions.
@@ -138,13 +383,16 @@ class StandardVerifier:
             "min_value": self.check_min_value,
             "max_date": self.check_max_date,
             "min_date": self.check_min_date,
+            "histogram": self.check_histogram,
+            "frequencies": self.check_frequencies,
+            "reference": self.check_reference,
         }
         return checks_dict[check]
 
     def __validate_data(self) -> pd.DataFrame:
         """
-        Run all checks for the DataFrame
-        :param enforce_dtypes: a bool to enforce constraint dtype on validation
+        Run all checks for the DataFrame. If a progress_callback is set,
+        it is called after every check with the fraction of checks done.
         :return: a DataFrame with number of breaks per column
         """
         if self.enforce_dtypes:
@@ -156,26 +404,287 @@ class StandardVerifier:
             }
             self.data = self.data.astype(dtypes)
 
+        total_checks = sum(len(value) for value in self.constraints.values())
+        done_checks = 0
         verification = {}
         for col_index, value in self.constraints.items():
-            verification[col_index] = {
-                check_key: self._call_checks(check_key)(
-                    self.constraints[col_index][check_key], col_index
-                )
-                for check_key, check_value in value.items()
-            }
+            verification[col_index] = dict.fromkeys(value)
+            for check_key in value:
+                verification[col_index][check_key] = self._call_checks(
+                    check_key
+                )(value[check_key], col_index)
+                done_checks += 1
+                if self.progress_callback is not None:
+                    self.progress_callback(done_checks / total_checks)
+            self._column_cache.clear()
         return pd.DataFrame(verification)
 
-    def __get_validation_data(self) -> pd.DataFrame:
+    @cached_property
+    def validation_data(self) -> pd.DataFrame:
         """
-        Gets all DataFrame rows with validation breaks.
+        Gets all DataFrame rows with validation breaks. Concatenated on
+        first access, writers can stream failed_rows instead.
         :param: None
         :returns: a DataFrame with rows of validation breaks
         """
+        if not self.keep_rows:
+            return self.get_validation_data()
         failed_data = pd.concat(self.failed_rows)
         return failed_data
 
 
+@dataclass
+class ChunkedVerifier:
+    """
+    The ChunkedVerifier class verifies constraints on an iterable of
+    DataFrame chunks, e.g. from utils.iter_excel or pd.read_csv with a
+    chunksize, holding a single chunk in memory at a time.
+    """
+
+    chunks: Iterable[pd.DataFrame]
+    constraints: dict
+    enforce_dtypes: bool = False
+
+    def __post_init__(self):
+        "Post init calculations."
+        for col, checks in self.constraints.items():
+            for check in ("histogram", "frequencies"):
+                if check in checks:
+                    raise ValueError(
+                        f"Check '{check}: {col}' needs the whole column"
+                    )
+        self.nr_rows = 0
+        self._seen = {}
+        self.validation_summary = self.__validate_data()
+
+    def check_unique(self, chunk: pd.DataFrame, col: str) -> int:
+        """
+        Check duplicate values within a chunk and against the value hashes
+        of the previous chunks
+        :param chunk: a DataFrame chunk
+        :param col: an str with the column name
+        :return: an int with count of breaks
+        """
+        values = chunk[col].dropna()
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        seen = self._seen.get(col, np.empty(0, dtype=np.uint64))
+        breaks = pd.Series(hashes).duplicated().to_numpy()
+        breaks |= np.isin(hashes, seen)
+        self._seen[col] = np.union1d(seen, hashes)
+        return int(breaks.sum())
+
+    def __validate_data(self) -> pd.DataFrame:
+        """
+        Verify every chunk and add up the breaks. Unique checks run across
+        chunks on value hashes.
+        :return: a DataFrame with number of breaks per column
+        """
+        verification = {
+            col: dict.fromkeys(checks)
+            for col, checks in self.constraints.items()
+        }
+        chunk_constraints = {
+            col: {key: val for key, val in checks.items() if key != "unique"}
+            for col, checks in self.constraints.items()
+        }
+        for chunk in self.chunks:
+            self.nr_rows += len(chunk)
+            summary = StandardVerifier(
+                chunk, chunk_constraints, self.enforce_dtypes, keep_rows=False
+            ).validation_summary
+            for col, checks in verification.items():
+                for check in checks:
+                    if check == "unique":
+                        count = 0
+                        if self.constraints[col]["unique"]:
+                            count = self.check_unique(chunk, col)
+                    else:
+                        count = summary.loc[check, col]
+                    if check == "data_type":
+                        checks[check] = bool(checks[check]) or bool(count)
+                    elif pd.notna(count):
+                        checks[check] = (checks[check] or 0) + count
+        return pd.DataFrame(verification)
+
+
+def _prunable(check: str, dtype) -> bool:
+    """Check if a check can be decided from parquet row group statistics"""
+    if check == "nullable":
+        return True
+    if check in ("min_value", "max_value"):
+        return pd.api.types.is_numeric_dtype(dtype)
+    if check in ("min_date", "max_date"):
+        return pd.api.types.is_datetime64_any_dtype(dtype)
+    return False
+
+
+def _may_break(
+    check: str, constraint, stats, dtype, nan_as_null: bool = False
+) -> bool:
+    """
+    Check if a row group could contain breaks of a check, given the
+    statistics of its column chunk
+    :param check: an str with a prunable check name
+    :param constraint: the constraint value
+    :param stats: the parquet column chunk statistics or None
+    :param dtype: the pandas dtype of the column
+    :param nan_as_null: a bool, True if float NaN values were written as
+    nulls, as pyarrow does for pandas DataFrames
+    :return: a bool, True unless the statistics rule out any break
+    """
+    if check == "nullable":
+        return _may_have_nulls(constraint, stats, dtype, nan_as_null)
+    if pd.isna(constraint):
+        return False
+    if stats is None or not stats.has_min_max:
+        return True
+    low, high = stats.min, stats.max
+    if check in ("min_date", "max_date"):
+        tz_name = getattr(dtype, "tz", None)
+        constraint = _parse_date_bound(
+            constraint, None if tz_name is None else str(tz_name)
+        )
+        low, high = pd.Timestamp(low).value, pd.Timestamp(high).value
+    if check in ("min_value", "min_date"):
+        return low < constraint
+    return high > constraint
+
+
+def _may_have_nulls(nullable: bool, stats, dtype, nan_as_null: bool) -> bool:
+    """
+    Check if a row group could contain breaks of a nullable check
+    :param nullable: the nullable constraint value
+    :param stats: the parquet column chunk statistics or None
+    :param dtype: the pandas dtype of the column
+    :param nan_as_null: a bool, True if float NaN values were written as
+    nulls
+    :return: a bool, True unless the statistics rule out any null
+    """
+    if nullable:
+        return False
+    # parquet null counts do not include float NaN values
+    if stats is None or (
+        pd.api.types.is_float_dtype(dtype) and not nan_as_null
+    ):
+        return True
+    return not stats.has_null_count or stats.null_count > 0
+
+
+def _row_group_stats(parquet) -> list:
+    """
+    Get the column chunk statistics of every row group of a parquet file
+    :param parquet: a pyarrow ParquetFile
+    :return: a list with a dict of statistics per column per row group
+    """
+    metadata = parquet.metadata
+    row_groups = []
+    for pos in range(metadata.num_row_groups):
+        row_group = metadata.row_group(pos)
+        row_groups.append(
+            {
+                row_group.column(idx).path_in_schema: row_group.column(
+                    idx
+                ).statistics
+                for idx in range(row_group.num_columns)
+            }
+        )
+    return row_groups
+
+
+@dataclass
+class ParquetVerifier:
+    """
+    The ParquetVerifier class verifies constraints on a parquet file.
+    nullable, min/max value and min/max date checks consult the row group
+    statistics first and decode only the row groups that could contain a
+    break. Other checks read their whole column. Requires pyarrow.
+    """
+
+    file_path: str
+    constraints: dict
+
+    def __post_init__(self):
+        "Post init calculations."
+        self.decoded_row_groups = {}
+        self._row_groups = []
+        self.validation_summary = self.__validate_data()
+
+    def __validate_data(self) -> pd.DataFrame:
+        """
+        Run all checks, pruning row groups with their statistics
+        :return: a DataFrame with number of breaks per column
+        """
+        # pylint: disable=import-outside-toplevel
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(self.file_path)
+        dtypes = parquet.schema_arrow.empty_table().to_pandas().dtypes
+        self._row_groups = _row_group_stats(parquet)
+        verification = {
+            col: dict.fromkeys(checks)
+            for col, checks in self.constraints.items()
+        }
+        full_checks = {}
+        for col, checks in self.constraints.items():
+            if col not in dtypes:
+                raise KeyError(col)
+            pruned = {}
+            for check, constraint in checks.items():
+                if check == "data_type":
+                    verification[col][check] = (
+                        dtype_name(dtypes[col]) != constraint
+                    )
+                elif check in ("min_date", "max_date") and not _prunable(
+                    check, dtypes[col]
+                ):
+                    continue
+                elif _prunable(check, dtypes[col]):
+                    pruned[check] = constraint
+                else:
+                    full_checks.setdefault(col, {})[check] = constraint
+            if pruned:
+                verification[col].update(
+                    self._verify_pruned(parquet, col, pruned, dtypes[col])
+                )
+        if full_checks:
+            data = parquet.read(columns=list(full_checks)).to_pandas()
+            summary = StandardVerifier(
+                data, full_checks, keep_rows=False
+            ).validation_summary
+            for col, checks in full_checks.items():
+                for check in checks:
+                    verification[col][check] = summary.loc[check, col]
+        return pd.DataFrame(verification)
+
+    def _verify_pruned(self, parquet, col: str, pruned: dict, dtype) -> dict:
+        """
+        Run the prunable checks of a column on the row groups whose
+        statistics do not rule out a break
+        :param parquet: a pyarrow ParquetFile
+        :param col: an str with the column name
+        :param pruned: a dict with the prunable checks of the column
+        :param dtype: the pandas dtype of the column
+        :return: a dict with the number of breaks per check
+        """
+        nan_as_null = b"pandas" in (parquet.schema_arrow.metadata or {})
+        groups = [
+            pos
+            for pos, stats in enumerate(self._row_groups)
+            if any(
+                _may_break(check, val, stats.get(col), dtype, nan_as_null)
+                for check, val in pruned.items()
+            )
+        ]
+        self.decoded_row_groups[col] = groups
+        if not groups:
+            return dict.fromkeys(pruned, 0)
+        data = parquet.read_row_groups(groups, columns=[col])
+        summary = StandardVerifier(
+            data.to_pandas(), {col: pruned}, keep_rows=False
+        ).validation_summary
+        return {check: summary.loc[check, col] for check in pruned}
+
+
 @dataclass
 class CustomVerifier:
     """
@@ -190,16 +699,20 @@ class CustomVerifier:
         "Post init calculations."
         self.failed_rows = []
         self.validation_summary = self.__validate_data()
-        self.validation_data: pd.DataFrame = self.__get_validation_data()
 
     def check_custom_constraints(self, constraint: dict) -> dict:
         """
-        Check custom constraints
+        Check custom constraints. Rules are compiled once to vectorized
+        expressions, unsupported syntax or operands fall back to
+        DataFrame.query.
         :param constraint: a custom constraint dict with name and query keys
         :return: an int with count of breaks
         """
-
-        rows = self.data.query(constraint["query"], engine="python").copy()
+        try:
+            rule = compile_rule(constraint["query"], tuple(self.data.columns))
+            rows = self.data.loc[rule(self.data)].copy()
+        except (ValueError, TypeError):
+            rows = self.data.query(constraint["query"], engine="python").copy()
         rows["Validation"] = f"{constraint['name']}: {constraint['query']}"
         self.failed_rows.append(rows)
         return rows.shape[0]
@@ -220,7 +733,95 @@ class CustomVerifier:
         summary = pd.DataFrame(verification).T.reset_index()
         return summary[["name", "rule", "count"]]
 
-    def __get_validation_data(self) -> pd.DataFrame:
+    @cached_property
+    def validation_data(self) -> pd.DataFrame:
+        """
+        Gets all dataframe rows with validation breaks. Concatenated on
+        first access, writers can stream failed_rows instead.
+        :param None:
+        :returns: a DataFrame with rows of validation breaks
+        """
+        failed_data = pd.concat(self.failed_rows)
+        return failed_data
+
+
+@dataclass
+class MultiColumnVerifier:
+    """
+    The MultiColumnVerifier class provides a way to verify composite key
+    and functional dependency constraints on a dataframe.
+    """
+
+    data: pd.DataFrame
+    constraints: list
+
+    def __post_init__(self):
+        "Post init calculations."
+        self.failed_rows = []
+        self.validation_summary = self.__validate_data()
+
+    def check_composite_unique(self, columns: list) -> pd.Series:
+        """
+        Check duplicated composite keys, rows with a null key are skipped
+        :param columns: a list of key column names
+        :return: a boolean Series with breaks
+        """
+        codes, nulls = group_codes(self.data, columns)
+        duplicated = pd.Series(codes).duplicated().to_numpy()
+        return pd.Series(~nulls & duplicated, index=self.data.index)
+
+    def check_functional_dependency(self, columns: list) -> pd.Series:
+        """
+        Check rows whose determinant value maps to more than one dependent
+        value, rows with a null determinant are skipped
+        :param columns: a list with the determinant and dependent columns
+        :return: a boolean Series with breaks
+        """
+        determinant, nulls = group_codes(self.data, columns[:1])
+        pairs, _ = group_codes(self.data, columns)
+        _, first = np.unique(pairs, return_index=True)
+        dependents = np.bincount(
+            determinant[first], minlength=determinant.max(initial=-1) + 1
+        )
+        breaks = ~nulls & (dependents[determinant] > 1)
+        return pd.Series(breaks, index=self.data.index)
+
+    def _call_checks(self, check: str):
+        """
+        Map constraint types with functions.
+        :param check: a str of constraint type
+        :return: a check function
+        """
+        checks_dict = {
+            "composite_unique": self.check_composite_unique,
+            "functional_dependency": self.check_functional_dependency,
+        }
+        return checks_dict[check]
+
+    def __validate_data(self) -> pd.DataFrame:
+        """
+        Run all checks for the dataframe
+        :param: None
+        :returns: a DataFrame with number of breaks per constraint
+        """
+        verification = {}
+        for constraint in self.constraints:
+            breaks = self._call_checks(constraint["type"])(
+                constraint["columns"]
+            )
+            rows = self.data.loc[breaks].copy()
+            rows["Validation"] = constraint["name"]
+            self.failed_rows.append(rows)
+            verification[constraint["name"]] = {
+                "name": constraint["name"],
+                "rule": constraint["type"],
+                "count": breaks.sum(),
+            }
+        summary = pd.DataFrame(verification).T.reset_index()
+        return summary[["name", "rule", "count"]]
+
+    @cached_property
+    def validation_data(self) -> pd.DataFrame:
         """
         Gets all dataframe rows with validation breaks.
         :param None:
@@ -0,0 +1,146 @@
+"""This module provides columnar writers for validation results
+
+Requires pyarrow. Break details are streamed from the verifier failed_rows
+or violations bitmap, one record batch per check, so the concatenated
+validation_data frame is never built.
+"""
+
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from verifiers import StandardVerifier
+
+
+def _open_writer(file_name: str, schema: pa.Schema):
+    """
+    Open a Parquet or Feather writer for a schema
+    :param file_name: an str with parquet or feather file name
+    :param schema: a pyarrow Schema
+    :return: a pyarrow writer
+    """
+    if file_name.endswith(".parquet"):
+        return pq.ParquetWriter(file_name, schema)
+    if file_name.endswith(".feather"):
+        return pa.ipc.new_file(file_name, schema)
+    raise ValueError("Save values can be 'parquet' or 'feather'")
+
+
+def _iter_failed_rows(verifier):
+    """
+    Iterate the failed rows of each check, from the violations bitmap when
+    the verifier does not keep row copies
+    """
+    if getattr(verifier, "keep_rows", True):
+        yield from verifier.failed_rows
+        return
+    for bit, (_, _, label) in enumerate(verifier.violations.checks):
+        rows = verifier.data.loc[verifier.violations.mask(bit)]
+        yield rows.assign(Validation=label)
+
+
+def _labels(verifier) -> list:
+    """
+    Get the Validation labels of all checks, from the violations bitmap
+    when the verifier has one, so no failing rows are built for them
+    """
+    violations = getattr(verifier, "violations", None)
+    if violations is not None:
+        return [label for _, _, label in violations.checks]
+    return [
+        rows["Validation"].iloc[0]
+        for rows in verifier.failed_rows
+        if not rows.empty
+    ]
+
+
+def _break_schema(data: pd.DataFrame, ids_only: bool) -> pa.Schema:
+    """
+    Get the break details schema from the whole verified frame, so a
+    column that is all null in the first failing rows is not typed null
+    :param data: the verified DataFrame
+    :param ids_only: a bool to only write the row ids and Validation
+    :return: a pyarrow Schema with a dictionary encoded Validation column
+    """
+    if ids_only:
+        data = pd.DataFrame({"row": data.index}, copy=False)
+    schema = pa.Schema.from_pandas(data.iloc[:0], preserve_index=not ids_only)
+    for col in data.columns[data.dtypes == object]:
+        pos = schema.get_field_index(str(col))
+        schema = schema.set(
+            pos,
+            schema.field(pos).with_type(
+                pa.infer_type(data[col], from_pandas=True)
+            ),
+        )
+    return schema.append(
+        pa.field("Validation", pa.dictionary(pa.int32(), pa.string()))
+    )
+
+
+def _break_table(
+    rows: pd.DataFrame, ids_only: bool, checks: pa.Array
+) -> pa.Table:
+    """
+    Convert the failed rows of one check to a table. Validation is encoded
+    against the dictionary of all checks, as Feather files only allow a
+    single dictionary per column.
+    """
+    label = rows["Validation"].iloc[0]
+    if ids_only:
+        table = pa.table({"row": rows.index.to_numpy()})
+    else:
+        table = pa.Table.from_pandas(
+            rows.drop(columns="Validation"), preserve_index=True
+        )
+    codes = np.full(len(rows), checks.index(label).as_py(), dtype=np.int32)
+    return table.append_column(
+        "Validation", pa.DictionaryArray.from_arrays(codes, checks)
+    )
+
+
+def write_validation_data(
+    verifier, file_name: str, ids_only: bool = False
+) -> int:
+    """
+    Write the validation break details to Parquet or Feather, one check
+    at a time with a dictionary encoded Validation column. Without kept
+    rows only the failing rows of the current check are in memory.
+    :param verifier: a StandardVerifier or CustomVerifier
+    :param file_name: an str with parquet or feather file name
+    :param ids_only: a bool to only write the row ids and Validation
+    :return: an int with the number of rows written
+    """
+    checks = pa.array(list(dict.fromkeys(_labels(verifier))), pa.string())
+    schema = _break_schema(verifier.data, ids_only)
+    written = 0
+    with _open_writer(file_name, schema) as writer:
+        for rows in _iter_failed_rows(verifier):
+            if rows.empty:
+                continue
+            table = _break_table(rows, ids_only, checks)
+            writer.write_table(table.cast(schema))
+            written += table.num_rows
+        if not written:
+            writer.write_table(schema.empty_table())
+    return written
+
+
+def write_validation_summary(verifier, file_name: str):
+    """
+    Write the validation summary to Parquet or Feather. The standard
+    summary is written with one row per attribute and one column per check.
+    :param verifier: a StandardVerifier or CustomVerifier
+    :param file_name: an str with parquet or feather file name
+    """
+    if isinstance(verifier, StandardVerifier):
+        summary = (
+            verifier.validation_summary.T.astype("float64")
+            .rename_axis("attribute")
+            .reset_index()
+        )
+    else:
+        summary = verifier.validation_summary.infer_objects()
+    table = pa.Table.from_pandas(summary, preserve_index=False)
+    with _open_writer(file_name, table.schema) as writer:
+        writer.write_table(table)